@@ -0,0 +1,81 @@
+"""
+Time-based tweens, advanced in fixed steps so an
+animation takes the same time at any frame rate.
+"""
+STEP      = 1 / 60  # <- Seconds per fixed update
+MAX_STEPS = 15  # <- Per frame, so a long stall doesn't turn into a burst
+
+
+def ease_out(t: float) -> float:
+    return 1 - (1 - t) ** 2
+
+
+class Tween():
+    """`start` to `end` (numbers or pg.Vector2s) over `duration` seconds"""
+    def __init__(self, start, end, duration: float, ease=ease_out):
+        self.start = start
+        self.end = end
+        self.duration = duration
+        self.ease = ease
+        self.elapsed = 0.0
+
+    @property
+    def done(self) -> bool:
+        return self.elapsed >= self.duration
+
+    @property
+    def value(self):
+        if self.done:
+            return self.end
+
+        return self.start + (self.end - self.start) \
+            * self.ease(self.elapsed / self.duration)
+
+
+class Timeline():
+    """
+    Named tweens plus the fixed-step clock that
+    drives them. Call `advance` once a frame with the
+    real time that passed and `step` as many times
+    as it says.
+    """
+    def __init__(self):
+        self.tweens = {}
+        self.accumulator = 0.0
+
+    def __contains__(self, key) -> bool:
+        """Whether `key` is still running"""
+        return key in self.tweens and not self.tweens[key].done
+
+    @property
+    def idle(self) -> bool:
+        return all(tween.done for tween in self.tweens.values())
+
+    def add(self, key, start, end, duration: float, ease=ease_out):
+        self.tweens[key] = Tween(start, end, duration, ease)
+
+    def advance(self, seconds: float) -> int:
+        """How many steps are due after `seconds` more real time"""
+        self.accumulator += seconds
+        steps = int(self.accumulator / STEP)
+        self.accumulator -= steps * STEP
+        if steps > MAX_STEPS:
+            steps = MAX_STEPS
+            self.accumulator = 0.0
+
+        return steps
+
+    def get(self, key, default=None):
+        tween = self.tweens.get(key)
+        return default if tween is None else tween.value
+
+    def skip(self):
+        """Jump every tween to its end"""
+        self.tweens = {}
+
+    def step(self):
+        for key, tween in list(self.tweens.items()):
+            if tween.done:
+                del self.tweens[key]  # <- Kept a step so its end can be read
+            else:
+                tween.elapsed += STEP
@@ -0,0 +1,104 @@
+"""
+Every bitmap in assets/ packed into one file, so
+startup is a single read with no BMP decoding.
+Rebuild it after changing anything in assets/:
+
+    python atlas.py
+"""
+import argparse
+import struct
+
+from pathlib import Path
+
+import pygame as pg
+
+
+MAGIC    = b'KLAT'
+VERSION  = 1
+HEADER   = struct.Struct('<4sHH')  # <- magic, version, image count
+ENTRY    = struct.Struct('<24sHHI')  # <- name, width, height, pixel offset
+COLORKEY = pg.Color('#ff00ff')
+KEYED    = ['card', 'card_back', 'label_foundations', 'label_graveyard',
+            'label_library']  # <- Images with transparent magenta
+
+
+def pack(directory: Path, path: Path):
+    """Write every BMP in `directory` to `path` as raw RGB"""
+    entries = []
+    pixels = bytearray()
+    for bmp in sorted(directory.glob('*.bmp')):
+        image = pg.image.load(bmp)
+        entries.append(ENTRY.pack(bmp.stem.encode(), *image.get_size(),
+                                  len(pixels)))
+        pixels += pg.image.tobytes(image, 'RGB')
+
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_bytes(HEADER.pack(MAGIC, VERSION, len(entries))
+                    + b''.join(entries) + pixels)
+    tmp.replace(path)
+
+
+class Atlas():
+    """
+    Images by name. Each one becomes a surface on
+    first use, converted to the display format (with
+    an RLE colorkey) once there is a display. Without
+    an atlas file, the BMPs are loaded instead.
+    """
+    def __init__(self, directory: Path, path: Path | None = None):
+        self.directory = directory
+        self.images = {}
+        self.entries = {}  # <- Name -> (width, height, offset)
+        self.pixels = None
+
+        if path is None or not path.exists():
+            return  # <- Fall back to the BMPs
+
+        data = path.read_bytes()
+        magic, version, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} atlas')
+
+        for n in range(count):
+            name, *entry = ENTRY.unpack_from(data, HEADER.size + n * ENTRY.size)
+            self.entries[name.rstrip(b'\0').decode()] = entry
+        self.pixels = memoryview(data)[HEADER.size + count * ENTRY.size:]
+
+    def __getitem__(self, name: str) -> pg.Surface:
+        image = self.images.get(name)
+        if image is not None:
+            return image
+
+        image = self.load(name)
+        if pg.display.get_surface() is not None:
+            image = image.convert()
+            self.images[name] = image  # <- Only keep display-format copies
+
+        if name in KEYED:
+            image.set_colorkey(COLORKEY, pg.RLEACCEL)
+
+        return image
+
+    def load(self, name: str) -> pg.Surface:
+        if name not in self.entries:
+            return pg.image.load(self.directory / f'{name}.bmp')
+
+        width, height, offset = self.entries[name]
+        return pg.image.frombuffer(
+            self.pixels[offset:offset + width * height * 3], (width, height),
+            'RGB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('directory', type=Path, nargs='?',
+                        default=Path('assets'))
+    parser.add_argument('-o', '--output', type=Path, default=None,
+                        help='atlas file (default: DIRECTORY/atlas.bin)')
+    args = parser.parse_args()
+
+    pack(args.directory, args.output or args.directory / 'atlas.bin')
+
+
+if __name__ == '__main__':
+    main()
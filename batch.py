@@ -0,0 +1,105 @@
+"""
+Solve a range of deals across every core:
+
+    python batch.py 0 100000 -o deals.txt
+
+Each finished deal appends one line to the output
+file: `seed winnable nodes seconds moves`, where
+winnable is 1, 0 or ? (limit hit) and moves is a
+run of three hex digits (source, depth, target) per
+move. Rerunning the same command skips the seeds
+already in the file.
+"""
+import argparse
+import sys
+
+from multiprocessing import Pool
+from pathlib import Path
+from time import perf_counter
+
+from rules import Klondike
+from solver import solve
+
+
+def encode_moves(moves: list[tuple[int, int, int]]) -> str:
+    return ''.join(f'{s:x}{d:x}{t:x}' for s, d, t in moves) or '-'
+
+
+def decode_moves(encoded: str) -> list[tuple[int, int, int]]:
+    if encoded == '-':
+        return []
+
+    return [tuple(int(c, 16) for c in encoded[n:n + 3])
+            for n in range(0, len(encoded), 3)]
+
+
+def format_result(seed: int, winnable: bool|None, nodes: int,
+                  seconds: float, moves: list[tuple[int, int, int]]) -> str:
+    flag = '?' if winnable is None else str(int(winnable))
+    return f'{seed} {flag} {nodes} {seconds:.4f} {encode_moves(moves)}\n'
+
+
+def read_done(path: Path) -> set[int]:
+    """Seeds already in `path`, dropping a torn last line if there is one"""
+    done = set()
+    if not path.exists():
+        return done
+
+    with open(path, 'rb+') as f:
+        data = f.read()
+        complete = data.rfind(b'\n') + 1
+        if complete < len(data):
+            f.truncate(complete)
+
+    for line in data[:complete].splitlines():
+        done.add(int(line.split(b' ', 1)[0]))
+
+    return done
+
+
+def solve_seed(job: tuple[int, int, float | None, int]) -> str:
+    seed, max_nodes, max_time, table_size = job
+    game = Klondike(seed)
+    result = solve(game, max_nodes, max_time, table_size)
+
+    return format_result(seed, result.winnable, result.nodes, result.elapsed,
+                         result.moves)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('start', type=int, help='first deal seed')
+    parser.add_argument('stop', type=int, help='last deal seed (exclusive)')
+    parser.add_argument('-o', '--output', type=Path, default=Path('deals.txt'))
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--max-nodes', type=int, default=2_000_000)
+    parser.add_argument('--max-time', type=float, default=None,
+                        help='seconds per deal')
+    parser.add_argument('--table-size', type=int, default=1_000_000,
+                        help='transposition table entries per worker')
+    args = parser.parse_args()
+
+    done = read_done(args.output)
+    jobs = [(seed, args.max_nodes, args.max_time, args.table_size)
+            for seed in range(args.start, args.stop) if seed not in done]
+    print(f'{len(done)} deals already solved, {len(jobs)} to go',
+          file=sys.stderr)
+
+    start = perf_counter()
+    winnable = 0
+    with Pool(args.workers) as pool, open(args.output, 'a') as output:
+        for n, line in enumerate(pool.imap_unordered(solve_seed, jobs,
+                                                     chunksize=4), 1):
+            output.write(line)
+            output.flush()
+            winnable += line.split(' ', 2)[1] == '1'
+
+            if not n % 1000 or n == len(jobs):
+                elapsed = perf_counter() - start
+                print(f'{n}/{len(jobs)} deals, {winnable} winnable, '
+                      f'{n / elapsed:.1f} deals/s', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""
+Headless benchmarks for the logic and rendering
+hot paths. Results are written as JSON so runs on
+different commits can be compared:
+
+    python bench.py -o before.json
+    python bench.py -o after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+
+from pathlib import Path
+from time import perf_counter
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame as pg
+
+import gfx
+import logic
+
+from rules import DEALS, Klondike, Rules
+
+
+BENCHMARKS = {}
+MAX_RANDOM_MOVES = 500  # <- Per random-play game, to stop endless shuffling
+
+
+def benchmark(function):
+    BENCHMARKS[function.__name__.removeprefix('bench_')] = function
+    return function
+
+
+def measure(function, state: dict, min_time: float, repeat: int) -> dict:
+    """
+    Call `function` (which returns how many operations
+    it did) until `min_time` has passed, `repeat` times,
+    keeping the best rate
+    """
+    best = 0
+    for _ in range(repeat):
+        operations = 0
+        start = perf_counter()
+        while (elapsed := perf_counter() - start) < min_time:
+            operations += function(state)
+        best = max(best, operations / elapsed)
+
+    return {'ops_per_sec': round(best, 2), 'us_per_op': round(1e6 / best, 3)}
+
+
+@benchmark
+def bench_klondike_construction(state: dict) -> int:
+    Klondike()
+    return 1
+
+
+@benchmark
+def bench_game_construction(state: dict) -> int:
+    logic.Game()
+    return 1
+
+
+@benchmark
+def bench_next_game(state: dict) -> int:
+    state['dealer'].next_game()
+    return 1
+
+
+@benchmark
+def bench_is_legal_move(state: dict) -> int:
+    """Every card against every pile, from a mid-game position"""
+    game = state['mid_game']
+    cards = [card for pile in game.piles for card in pile]
+    for card in cards:
+        for pile in game.piles:
+            game.is_legal_move(card, pile)
+
+    return len(cards) * len(game.piles)
+
+
+@benchmark
+def bench_legal_moves(state: dict) -> int:
+    state['mid_game'].legal_moves()
+    return 1
+
+
+@benchmark
+def bench_random_play(state: dict) -> int:
+    """Whole games of uniformly random legal moves"""
+    random_play(state['dealer'], state['rng'])
+    return 1
+
+
+@benchmark
+def bench_random_play_variant(state: dict) -> int:
+    """Random play drawing three, no pass limit, any card on empty columns"""
+    random_play(state['variant_dealer'], state['rng'])
+    return 1
+
+
+@benchmark
+def bench_draw_start(state: dict) -> int:
+    draw_frame(state['screen'], state['start'])
+    return 1
+
+
+@benchmark
+def bench_draw_long_stacks(state: dict) -> int:
+    draw_frame(state['screen'], state['long_stacks'])
+    return 1
+
+
+@benchmark
+def bench_draw_menu(state: dict) -> int:
+    draw_frame(state['screen'], state['menu'])
+    return 1
+
+
+@benchmark
+def bench_load_card_text(state: dict) -> int:
+    gfx.load_card_text()
+    return 1
+
+
+def draw_frame(screen: pg.Surface, game: logic.Game):
+    gfx.draw(screen, game, '1.0.0')
+    pg.display.flip()
+
+
+def long_stacks_game() -> logic.Game:
+    """Four King-to-2 runs, the rest face down under them"""
+    game = logic.Game(0)
+    game.collect()
+    cards = {(card.suit, card.rank): card for card in game.library}
+    game.library.set_cards([])
+
+    suits = [('hearts', 'spades'), ('spades', 'hearts'),
+             ('diamonds', 'clubs'), ('clubs', 'diamonds')]
+    for pile, pair in zip(game.tableau, suits):
+        for rank in range(13, 1, -1):
+            card = cards.pop((pair[(13 - rank) % 2], rank))
+            card.flip()
+            pile.place(card)
+
+    game.tableau[6].set_cards(list(cards.values()))  # <- Aces, face down
+    game.set_focus(pg.Vector2(0, 1))
+    return game
+
+
+def mid_game(seed: int = 0, moves: int = 40) -> Klondike:
+    game = Klondike(seed)
+    rng = random.Random(seed)
+    for _ in range(moves):
+        legal = game.legal_moves()
+        if not legal:
+            break
+        game.move(*rng.choice(legal))
+
+    return game
+
+
+def random_play(game: Klondike, rng: random.Random):
+    game.next_game(rng.randrange(DEALS))
+    for _ in range(MAX_RANDOM_MOVES):
+        moves = game.legal_moves()
+        if not moves:
+            break
+        game.move(*rng.choice(moves))
+
+
+def compare(results: dict, baseline: dict):
+    print(f'\n{"benchmark":<24} {"before":>12} {"after":>12} {"change":>8}')
+    for name, result in results['results'].items():
+        before = baseline['results'].get(name)
+        if before:
+            change = result['ops_per_sec'] / before['ops_per_sec']
+            print(f'{name:<24} {before["ops_per_sec"]:>12.1f} '
+                  f'{result["ops_per_sec"]:>12.1f} {change:>7.2f}x')
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('names', nargs='*', help='benchmarks to run (all)')
+    parser.add_argument('-o', '--output', type=Path, default=None)
+    parser.add_argument('--compare', type=Path, default=None,
+                        help='earlier results to compare against')
+    parser.add_argument('--min-time', type=float, default=0.5,
+                        help='seconds per measurement')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pg.init()
+    screen = pg.display.set_mode((240, 160))  # <- Before any image is used
+    gfx.load_card_text()
+
+    menu = logic.Game(0)
+    menu.toggle_menu()
+    state = {
+        'screen': screen,
+        'dealer': Klondike(0),
+        'variant_dealer': Klondike(0, rules=Rules(3, None,
+                                                  kings_only=False)),
+        'rng': random.Random(0),
+        'mid_game': mid_game(),
+        'start': logic.Game(0),
+        'long_stacks': long_stacks_game(),
+        'menu': menu,
+    }
+
+    results = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'pygame': pg.version.ver,
+        'machine': platform.machine(),
+        'results': {},
+    }
+    for name, function in BENCHMARKS.items():
+        if args.names and name not in args.names:
+            continue
+
+        result = measure(function, state, args.min_time, args.repeat)
+        results['results'][name] = result
+        print(f'{name:<24} {result["ops_per_sec"]:>12.1f}/s '
+              f'{result["us_per_op"]:>12.3f} us')
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + '\n')
+    if args.compare:
+        compare(results, json.loads(args.compare.read_text()))
+
+
+if __name__ == '__main__':
+    main()
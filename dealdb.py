@@ -0,0 +1,149 @@
+"""
+Precomputed deal database: one fixed-width record
+per deal number holding its card order and solver
+results, read through mmap so any deal is one
+offset calculation away.
+
+    python dealdb.py build deals.db 0 100000 --results deals.txt
+    python dealdb.py show deals.db 1234
+"""
+import argparse
+import mmap
+import struct
+
+from pathlib import Path
+from random import Random
+
+from rules import deal_order
+
+
+MAGIC  = b'KLDB'
+HEADER = struct.Struct('<4sHHII')  # <- magic, version, record size, first, count
+RECORD = struct.Struct('<52sBIH')  # <- order, flags, nodes, solution length
+VERSION = 1
+
+SOLVED   = 1  # <- Flag bits
+WINNABLE = 2
+
+
+class Deal():
+    def __init__(self, number: int, order: bytes, flags: int, nodes: int,
+                 solution_length: int):
+        self.number = number
+        self.order = order  # <- Card ids in library order, as rules.deal_order
+        self.solved = bool(flags & SOLVED)
+        self.winnable = bool(flags & WINNABLE)
+        self.nodes = nodes  # <- Search nodes needed, used as difficulty
+        self.solution_length = solution_length
+
+    def __repr__(self) -> str:
+        if not self.solved:
+            status = 'unsolved'
+        else:
+            status = 'winnable' if self.winnable else 'unwinnable'
+
+        return f'Deal #{self.number} ({status}, {self.nodes} nodes)'
+
+
+class DealDatabase():
+    def __init__(self, path: Path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, record_size, self.first, self.count = \
+            HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            raise ValueError(f'{path} is not a version {VERSION} deal database')
+
+    def __contains__(self, number: int) -> bool:
+        return self.first <= number < self.first + self.count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def get(self, number: int) -> Deal | None:
+        if number not in self:
+            return None
+
+        offset = HEADER.size + (number - self.first) * RECORD.size
+        return Deal(number, *RECORD.unpack_from(self.data, offset))
+
+    def next_winnable(self, number: int) -> Deal | None:
+        """First winnable deal at or after `number`, wrapping around"""
+        for n in range(self.count):
+            deal = self.get(self.first + (number - self.first + n) % self.count)
+            if deal.winnable:
+                return deal
+
+        return None
+
+    def pick(self, winnable_only: bool = False,
+             rng: Random | None = None) -> Deal | None:
+        """A random deal, or None if there are none to pick"""
+        if not self.count:
+            return None
+
+        number = self.first + (rng or Random()).randrange(self.count)
+        if winnable_only:
+            return self.next_winnable(number)
+
+        return self.get(number)
+
+
+def build(path: Path, first: int, count: int, results: Path | None = None):
+    """
+    Write deals first..first+count-1, taking solver
+    metadata from a batch.py output file if given
+    """
+    solved = {}
+    if results is not None:
+        with open(results) as f:
+            for line in f:
+                seed, winnable, nodes, _, moves = line.split()
+                if winnable != '?':
+                    flags = SOLVED | (WINNABLE if winnable == '1' else 0)
+                    length = 0 if moves == '-' else len(moves) // 3
+                    solved[int(seed)] = (flags, int(nodes), length)
+
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, first, count))
+        for number in range(first, first + count):
+            flags, nodes, length = solved.get(number, (0, 0, 0))
+            f.write(RECORD.pack(bytes(deal_order(number)), flags,
+                                min(nodes, 0xffffffff), min(length, 0xffff)))
+
+    tmp.replace(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = commands.add_parser('build', help='write a deal database')
+    build_parser.add_argument('path', type=Path)
+    build_parser.add_argument('start', type=int, help='first deal number')
+    build_parser.add_argument('stop', type=int,
+                              help='last deal number (exclusive)')
+    build_parser.add_argument('--results', type=Path, default=None,
+                              help='batch.py output to take metadata from')
+
+    show_parser = commands.add_parser('show', help='print one deal')
+    show_parser.add_argument('path', type=Path)
+    show_parser.add_argument('number', type=int)
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        build(args.path, args.start, args.stop - args.start, args.results)
+    else:
+        deals = DealDatabase(args.path)
+        print(deals.get(args.number))
+        deals.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,440 @@
+"""
+Press random buttons in many deals across every
+core, checking the game's invariants after each
+press:
+
+    python fuzz.py 0 1000 -o failures
+
+New sequences mix random presses with runs that
+steer to a move and play it (keeping to a solved
+line for the deal while they can, so some games get
+won), or to a card deep in a stack and press
+something there. The ones that reach new states
+are kept and mutated, and the one furthest into
+the deal is carried on, so later rounds dig into
+menus, stacks and endgames rather than starting
+over. A failing sequence is shrunk to the fewest
+presses that still fail the same way and saved as
+a replay (without a final hash); check one with
+
+    python fuzz.py --check failures/123.klr
+"""
+import argparse
+import sys
+
+from multiprocessing import Pool
+from pathlib import Path
+from random import Random
+from time import perf_counter
+from typing import Iterator
+
+from logic import Game
+from replay import BUTTONS, HEADER, MAGIC, VERSION, decode, encode_event
+from rules import FOUNDATIONS, GRAVEYARD, LIBRARY, TABLEAU, Klondike, Pile
+from solver import solve
+
+
+MAX_UPDATES = 30  # <- Most fixed updates run between two presses
+UPDATE_ODDS = 0.2  # <- Chance of running any updates before a press
+MUTATE_ODDS = 0.7  # <- Chance a round mutates a kept sequence, then
+                   #    that it carries on the deepest one
+AIM_PRESSES = 12  # <- Most presses spent steering the focus
+SOLVE_NODES = 100_000  # <- Search for each deal's winning line
+FOLLOW_ODDS = 0.8  # <- Chance a move keeps to the line, while on it
+
+# A case is a list of (updates, button): the Game.update calls to run,
+# then the button to press
+
+
+def check(game: Game) -> str | None:
+    """The first invariant `game` breaks, as 'name: details'"""
+    ids = sorted([card.id for pile in game.piles for card in pile.cards])
+    if ids != list(range(52)):
+        return f'cards: {len(ids)} cards, {len(set(ids))} distinct'
+
+    for pile in game.foundations:
+        ids = [card.id for card in pile.cards]
+        if ids and ids != list(range(ids[0] - ids[0] % 13, ids[-1] + 1)):
+            return f'foundation: {pile}'  # <- Not one suit, ace up
+
+    face_down = 0
+    for pile in game.tableau:
+        face_up = [card.is_face_up for card in pile.cards]
+        if face_up != sorted(face_up) or (pile and not face_up[-1]):
+            return f'tableau: {pile}'
+        face_down += face_up.count(False)
+    if face_down != game.face_down_cards:
+        return f'face down: {game.face_down_cards}, board has {face_down}'
+
+    if game.money != game.bank + game.game_earnings:
+        return f'money: {game.money} != {game.bank} + {game.game_earnings}'
+    if game.foundation_cards != sum(map(len, game.foundations)):
+        return f'foundation count: {game.foundation_cards}'
+
+    x, y = int(game.focus_coords.x), int(game.focus_coords.y)
+    if game.focus_coords != (x, y) or y not in [0, 1] \
+            or not 0 <= x < len(game.focus_areas[y]) or (x, y) == (2, 0):
+        return f'focus: {game.focus_coords}'
+
+    pile = game.get_focused_pile()
+    if not stack_offset_valid(pile, game.focus_stack_offset):
+        return f'focus offset: {game.focus_stack_offset} in {pile}'
+
+    if game.selected_card is not None:
+        pile = game.selected_card_pile
+        if pile is None or game.selected_card not in pile.cards:
+            return f'selection: {game.selected_card} not in {pile}'
+        if not stack_offset_valid(pile, game.selected_stack_offset) \
+                or pile[game.selected_stack_offset - 1] \
+                is not game.selected_card:
+            return f'selected offset: {game.selected_stack_offset} in {pile}'
+
+    return None
+
+
+def stack_offset_valid(pile: Pile, offset: int) -> bool:
+    """Whether `offset` picks a face-up card of `pile`, counting from the top"""
+    if offset == 0:
+        return True
+
+    return pile.index in TABLEAU and -offset < len(pile) \
+        and pile[offset - 1].is_face_up
+
+
+def features(game: Game, button: str) -> tuple:
+    """A coarse summary of the state a press led to"""
+    pile = game.get_focused_pile()
+    return (button, game.foundation_cards, game.face_down_cards,
+            game.menu, game.win, game.game_over,
+            bool(game.autocomplete), tuple(game.focus_coords), len(pile) > 0,
+            max(game.focus_stack_offset, -3),
+            max(game.selected_stack_offset, -3),
+            game.selected_card_pile is not None
+            and game.selected_card_pile.index in FOUNDATIONS)
+
+
+def play(game: Game, updates: int, button: str) -> str | None:
+    """Run the updates, press the button, and check"""
+    try:
+        for _ in range(updates):
+            game.update()
+        game.handle_button_press(button)
+        return check(game)
+    except Exception as e:
+        return f'{type(e).__name__}: {e}'
+
+
+def run_case(seed: int, case: list[tuple[int, str]],
+             seen: set | None = None) -> tuple[str | None, int]:
+    """
+    Play `case` on deal `seed`, adding each state's
+    features to `seen`. Returns the failure, if any,
+    and how many presses were played.
+    """
+    game = Game(seed)
+    for n, (updates, button) in enumerate(case):
+        failure = play(game, updates, button)
+        if failure is not None:
+            return failure, n + 1
+        if seen is not None:
+            seen.add(features(game, button))
+
+    return None, len(case)
+
+
+def explore(seed: int, rng: Random, length: int, seen: set, line: list,
+            case: list | None = None) -> tuple[str | None, list, tuple]:
+    """
+    A new case (or `case` with more on the end),
+    picked press by press as it's played. Returns the
+    failure, if any, the case up to it, and how far
+    into the deal it got.
+    """
+    game = Game(seed)
+    case = list(case or [])
+    for n, event in enumerate(case):
+        failure = play(game, *event)
+        if failure is not None:
+            return failure, case[:n + 1], ()
+
+    length += len(case)
+    events = iter([])
+    while len(case) < length:
+        event = next(events, None)
+        if event is None:
+            events = intent(game, rng, line)
+            continue
+
+        case.append(event)
+        failure = play(game, *event)
+        if failure is not None:
+            return failure, case, ()
+        seen.add(features(game, event[1]))
+
+    return None, case, (game.games == 1, game.win, game.foundation_cards,
+                        -game.face_down_cards)  # <- Still on the first deal
+
+
+def intent(game: Game, rng: Random,
+           line: list) -> Iterator[tuple[int, str]]:
+    """A few presses with one aim, each chosen after the last is played"""
+    match rng.randrange(4):
+        case 0:
+            yield random_event(rng)
+        case 1 | 2:  # <- Play a legal move, the way a player would
+            if game.menu:
+                yield 0, 'B'
+                return
+
+            move = None
+            if rng.random() < FOLLOW_ODDS and game.games == 1:
+                move = follow(game, line)
+                if move == 'undo':
+                    yield 0, 'SELECT'  # <- Back towards the line
+                    return
+            if move is None:
+                move = pick_move(game, rng)
+            if move is None:
+                yield random_event(rng)
+                return
+
+            source, depth, target = move
+            yield from aim(game, game.get_pile_coords(source), 1 - depth)
+            if source == LIBRARY:
+                yield 0, 'A'
+            elif target in FOUNDATIONS and rng.random() < 0.5:
+                yield 0, 'R2'
+            else:
+                yield 0, 'A'
+                yield from aim(game, game.get_pile_coords(target), 0)
+                yield 0, 'A'
+        case 3:  # <- Press anything on a card partway down a stack
+            pile = game.tableau[rng.randrange(len(game.tableau))]
+            face_up = len([card for card in pile if card.is_face_up])
+            yield from aim(game, game.get_pile_coords(pile.index),
+                           -rng.randrange(max(face_up, 1)))
+            yield 0, rng.choice(BUTTONS)
+
+
+def follow(game: Game, line: list) -> tuple[int, int, int] | str | None:
+    """
+    The next move of `line`, or 'undo' if the deal
+    has strayed from it
+    """
+    for entry, move in zip(game.history, line):
+        if (entry & 15, entry >> 8 & 15, entry >> 4 & 15) != move:
+            return 'undo'
+
+    played = len(game.history)
+    if played < len(line):
+        return line[played]
+    return 'undo' if played > len(line) else None
+
+
+def pick_move(game: Game, rng: Random) -> tuple[int, int, int] | None:
+    """
+    Mostly a move that gets on with the deal, so
+    cases get far enough in to win it
+    """
+    moves = game.legal_moves()
+    if not moves or rng.random() < 0.2:
+        return rng.choice(moves) if moves else None
+
+    def progress(move: tuple[int, int, int]) -> int:
+        source, depth, target = move
+        pile = game.piles[source]
+        if target in FOUNDATIONS:
+            return 0
+        if source in TABLEAU and depth < len(pile) \
+                and not pile[-depth - 1].is_face_up:
+            return 1  # <- Reveals a card
+        if source == GRAVEYARD:
+            return 2
+        if source == LIBRARY:
+            return 3
+        return 4
+
+    best = min(map(progress, moves))
+    return rng.choice([move for move in moves if progress(move) == best])
+
+
+def aim(game: Game, coords, offset: int) -> Iterator[tuple[int, str]]:
+    """Presses that move the focus to `coords` and `offset`, within reason"""
+    for _ in range(AIM_PRESSES):
+        if game.focus_coords.y != coords.y:
+            yield 0, 'DOWN'
+        elif game.focus_coords.x != coords.x:
+            right = (coords.x - game.focus_coords.x) % len(game.tableau)
+            yield 0, 'RIGHT' if right <= len(game.tableau) // 2 else 'LEFT'
+        elif game.focus_stack_offset > offset:
+            yield 0, 'UP'
+        elif game.focus_stack_offset < offset:
+            yield 0, 'DOWN'
+        else:
+            return
+
+
+def random_event(rng: Random) -> tuple[int, str]:
+    updates = rng.randint(1, MAX_UPDATES) if rng.random() < UPDATE_ODDS else 0
+    return updates, rng.choice(BUTTONS)
+
+
+def mutate(rng: Random, case: list, corpus: list) -> list:
+    case = list(case)
+    match rng.randrange(4):
+        case 0:  # <- Replace a run of presses
+            start = rng.randrange(len(case))
+            for n in range(start, min(len(case), start + rng.randint(1, 8))):
+                case[n] = random_event(rng)
+        case 1:  # <- Insert a run
+            start = rng.randrange(len(case) + 1)
+            case[start:start] = [random_event(rng)
+                                 for _ in range(rng.randint(1, 8))]
+        case 2:  # <- Delete a run
+            start = rng.randrange(len(case))
+            del case[start:start + rng.randint(1, 8)]
+        case 3:  # <- Splice on the tail of another kept case
+            other = rng.choice(corpus)
+            case = case[:rng.randrange(len(case) + 1)] \
+                + other[rng.randrange(len(other)):]
+
+    return case or [random_event(rng)]
+
+
+def shrink(seed: int, case: list, failure: str) -> list:
+    """
+    The shortest case found that still fails the
+    same invariant: drop chunks of presses, halving
+    the chunk size, then drop the updates
+    """
+    kind = failure.split(':')[0]
+
+    def fails(candidate: list) -> bool:
+        result, _ = run_case(seed, candidate)
+        return result is not None and result.split(':')[0] == kind
+
+    shrunk = None
+    while shrunk != case:  # <- Until no single press can go
+        shrunk = case
+        chunk = len(case) // 2
+        while chunk >= 1:
+            start = 0
+            while start < len(case):
+                candidate = case[:start] + case[start + chunk:]
+                if candidate and fails(candidate):
+                    case = candidate
+                else:
+                    start += chunk
+            chunk //= 2
+
+    for n, (updates, button) in enumerate(case):
+        if updates and fails(case[:n] + [(0, button)] + case[n + 1:]):
+            case[n] = (0, button)
+
+    return case
+
+
+def fuzz_seed(job: tuple[int, int, int]) -> tuple[int, int, str | None, list]:
+    """Fuzz one deal: (seed, presses, failure or None, shrunk case)"""
+    seed, rounds, length = job
+    rng = Random(seed)
+    line = solve(Klondike(seed), SOLVE_NODES, table_size=SOLVE_NODES).moves
+    corpus = []
+    deepest = ((), [])  # <- (how far, case) of the case furthest into the deal
+    seen = set()
+    presses = 0
+
+    for _ in range(rounds):
+        known = len(seen)
+        depth = ()
+        if corpus and rng.random() < MUTATE_ODDS:
+            case = mutate(rng, rng.choice(corpus), corpus)
+            failure, played = run_case(seed, case, seen)
+            case = case[:played]
+        elif corpus and rng.random() < MUTATE_ODDS:  # <- Carry on the deepest
+            failure, case, depth = explore(seed, rng, length // 4, seen, line,
+                                           deepest[1])
+        else:
+            failure, case, depth = explore(seed, rng, length, seen, line)
+
+        presses += len(case)
+        if depth >= deepest[0]:
+            deepest = depth, case
+        if failure is not None:
+            return seed, presses, failure, shrink(seed, case, failure)
+        if len(seen) > known:
+            corpus.append(case)
+
+    return seed, presses, None, []
+
+
+def encode_case(seed: int, case: list[tuple[int, str]]) -> bytes:
+    return HEADER.pack(MAGIC, VERSION, seed) + b''.join(
+        encode_event(updates, BUTTONS.index(button))
+        for updates, button in case)
+
+
+def decode_case(data: bytes) -> tuple[int, list[tuple[int, str]]]:
+    seed, _, events, _, _ = decode(data)
+    case = []
+    last_step = 0
+    for step, button in events:
+        case.append((step - last_step, button))
+        last_step = step
+
+    return seed, case
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('start', type=int, nargs='?', default=0,
+                        help='first deal seed')
+    parser.add_argument('stop', type=int, nargs='?', default=100,
+                        help='last deal seed (exclusive)')
+    parser.add_argument('-o', '--output', type=Path, default=Path('failures'),
+                        help='directory for failing replays')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--rounds', type=int, default=200,
+                        help='sequences tried per deal')
+    parser.add_argument('--length', type=int, default=200,
+                        help='presses in each new random sequence')
+    parser.add_argument('--check', type=Path, nargs='+', default=None,
+                        help='replay saved failures instead of fuzzing')
+    args = parser.parse_args()
+
+    if args.check:
+        failed = 0
+        for path in args.check:
+            seed, case = decode_case(path.read_bytes())
+            failure, played = run_case(seed, case)
+            if failure is not None:
+                failed += 1
+                print(f'{path}: press {played}: {failure}')
+        print(f'{len(args.check)} cases, {failed} still failing')
+        sys.exit(1 if failed else 0)
+
+    jobs = [(seed, args.rounds, args.length)
+            for seed in range(args.start, args.stop)]
+    failures = 0
+    presses = 0
+    start = perf_counter()
+    with Pool(args.workers) as pool:
+        for seed, played, failure, case in pool.imap_unordered(fuzz_seed,
+                                                               jobs):
+            presses += played
+            if failure is not None:
+                failures += 1
+                args.output.mkdir(parents=True, exist_ok=True)
+                path = args.output / f'{seed}.klr'
+                path.write_bytes(encode_case(seed, case))
+                print(f'{path}: {len(case)} presses: {failure}', flush=True)
+
+    elapsed = perf_counter() - start
+    print(f'{len(jobs)} deals, {failures} failing, {presses} presses, '
+          f'{presses / elapsed * 60:,.0f}/min')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,53 +1,79 @@
 import pygame as pg
 
+from collections import deque
 from pygame._sdl2 import controller
 
 
+QUEUE_SIZE = 32  # <- Presses kept between drains; the oldest go first
+
+
 class Gamepad():
+    """
+    Turns SDL events into button names, queued in
+    the order they arrived with the SDL tick count
+    they were read at, so no press is lost when
+    several land in one frame
+    """
     def __init__(self):
         controller.init()
         self.controller = controller.Controller(0)
 
-        self.button_press = None
+        self.presses = deque(maxlen=QUEUE_SIZE)
+        self.ticks = 0  # <- Stamp for presses from the events being read
 
-    def get_button_press(self) -> str | None:
-        button = self.button_press
-        self.button_press = None
+    def get_button_presses(self) -> list[tuple[str, int]]:
+        """Every (button, ticks) queued since the last call, oldest first"""
+        presses = list(self.presses)
+        self.presses.clear()
 
-        return button
+        return presses
 
     def handle_button_press(self, button: int):
         match button:
             case 0:
-                self.button_press = 'B'
+                self.press('B')
             case 1:
-                self.button_press = 'A'
+                self.press('A')
             case 2:
-                self.button_press = 'Y'
+                self.press('Y')
             case 3:
-                self.button_press = 'X'
+                self.press('X')
             case 4:  # <- L1 button (doubles L2)
-                self.button_press = 'L2'
+                self.press('L2')
             case 5:  # <- R1 button (doubles R2)
-                self.button_press = 'R2'
+                self.press('R2')
+            case 6:
+                self.press('SELECT')
             case 7:
-                self.button_press = 'START'
+                self.press('START')
+            case 8:
+                self.press('HOME')
             case _:
                 pass
 
     def handle_dpad_press(self, dpad_value: tuple[int]):
         match dpad_value:
             case (0, 1):
-                self.button_press = 'UP'
+                self.press('UP')
             case (0, -1):
-                self.button_press = 'DOWN'
+                self.press('DOWN')
             case (-1, 0):
-                self.button_press = 'LEFT'
+                self.press('LEFT')
             case (1, 0):
-                self.button_press = 'RIGHT'
+                self.press('RIGHT')
             case _:
                 pass
 
+    def handle_event(self, event: pg.event.Event, ticks: int):
+        self.ticks = ticks
+        if event.type == pg.JOYBUTTONDOWN:
+            self.handle_button_press(event.button)
+        elif event.type == pg.JOYHATMOTION:  # <- DPAD buttons
+            if event.value != (0, 0):  # <- Ignore DPAD "release"
+                self.handle_dpad_press(event.value)
+        elif event.type == pg.JOYAXISMOTION:
+            self.handle_joyaxis(event.axis, event.value)
+
     def handle_joyaxis(self, axis: int, value: float):
         """
         L2 and R2 come across as JOYAXISMOTION
@@ -60,7 +86,10 @@ class Gamepad():
         """
         if axis == 2:
             if int(value) == 1:
-                self.button_press = 'L2'
+                self.press('L2')
         elif axis == 5:
             if int(value) == 1:
-                self.button_press = 'R2'
+                self.press('R2')
+
+    def press(self, button: str):
+        self.presses.append((button, self.ticks))
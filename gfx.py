@@ -1,5 +1,10 @@
 import pygame as pg
 
+from anim import Timeline
+from atlas import Atlas
+from functools import lru_cache
+from layout import (CARD_DIMS, GAP, GRAVEYARD, LIBRARY, TABLEAU_1,
+                    get_card_coords, get_foundation_coords)
 from logic import Card, Game, Pile
 from pathlib import Path
 
@@ -16,49 +21,33 @@ RED         = pg.Color('#ff5555')
 YELLOW      = pg.Color('#f1fa8c')
 TRANSPARENT = pg.Color('#ff00ff')
 
-# Borders and anchor points
-PADDING      = 6
-GAP          = 5
-STACK_HEIGHT = 9
-FACE_DOWN_HT = 4
-CARD_DIMS    = pg.Vector2(27, 35)
-LIBRARY      = pg.Vector2(PADDING, PADDING + 2)
-GRAVEYARD    = pg.Vector2(PADDING + CARD_DIMS.x + GAP, PADDING + 2)
-GAME_LABEL   = pg.Vector2(73, 14)
-FOUNDATION_1 = pg.Vector2(PADDING + (CARD_DIMS.x + GAP) * 3, PADDING + 2)
+# Anchor points, besides the piles' in layout
+GAME_LABEL       = pg.Vector2(73, 14)
 FOUNDATION_LABEL = pg.Vector2(149, 3)
-TABLEAU_1    = LIBRARY + (0, CARD_DIMS.y + PADDING)
+MENU_COORDS      = pg.Vector2(78, 61)
 
-# Images
+moving = []  # <- (image, coords) of sliding cards, drawn over the rest
+
+# Tableau card positions, per pile: ((pile, version, start), layout)
+tableau_layouts = [None] * 7
+
+# Images, loaded on first use
 assets = Path('assets')
-CARD_IMG          = pg.image.load(assets / 'card.bmp')
-CARD_BACK_IMG     = pg.image.load(assets / 'card_back.bmp')
-LABEL_LIBRARY     = pg.image.load(assets / 'label_library.bmp')
-LABEL_GRAVEYARD   = pg.image.load(assets / 'label_graveyard.bmp')
-LABEL_FOUNDATIONS = pg.image.load(assets / 'label_foundations.bmp')
-NEXT_GAME         = pg.image.load(assets / 'next_game.bmp')
-NEXT_GAME_SEL     = pg.image.load(assets / 'next_game_selected.bmp')
-START_OVER        = pg.image.load(assets / 'start_over.bmp')
-START_OVER_SEL    = pg.image.load(assets / 'start_over_selected.bmp')
-BROKE             = pg.image.load(assets / 'broke.bmp')
-WINNER            = pg.image.load(assets / 'winner.bmp')
-KEEP_PLAYING      = pg.image.load(assets / 'keep_playing.bmp')
-KEEP_PLAYING_SEL  = pg.image.load(assets / 'keep_playing_selected.bmp')
-GAME              = pg.image.load(assets / 'game.bmp')
-TEXT              = {}
-CARD_IMG.set_colorkey(pg.Color('#ff00ff'))
-CARD_BACK_IMG.set_colorkey(pg.Color('#ff00ff'))
-LABEL_LIBRARY.set_colorkey(pg.Color('#ff00ff'))
-LABEL_GRAVEYARD.set_colorkey(pg.Color('#ff00ff'))
-LABEL_FOUNDATIONS.set_colorkey(pg.Color('#ff00ff'))
+ASSETS = Atlas(assets, assets / 'atlas.bin')
+TEXT   = {}
 
 
 def draw(screen: pg.Surface, game: Game, version_info: str):
-    screen.fill(BACKGROUND)
+    """
+    Draw `game` as it stands, with the slides Game
+    started; drawing never changes the game
+    """
+    animations = game.animations
+    moving.clear()
+
+    screen.blit(render_background(screen.get_size(), version_info), (0, 0))
 
-    draw_board(screen)
     draw_games_played(screen, game.games)
-    draw_version_number(screen, version_info)
 
     for pile in game.piles:
         if pile.empty_focused:  # Draw focus box on empty pile
@@ -68,27 +57,26 @@ def draw(screen: pg.Surface, game: Game, version_info: str):
             draw_focus_box(screen, RED, box_coords, True)
             break
 
-    if game.library.get_top_card():
-        draw_card(screen, game.library.get_top_card(), LIBRARY, False, False)
-
-    if game.graveyard.get_top_card():
-        draw_card(screen, game.graveyard.get_top_card(), GRAVEYARD,
-            game.graveyard.get_top_card().selected, True)
+    draw_pile_top(screen, game.library, LIBRARY, False, animations)
+    draw_pile_top(screen, game.graveyard, GRAVEYARD, True, animations)
 
-    draw_foundations(screen, game.foundations)
+    draw_foundations(screen, game.foundations, animations)
 
     draw_tableau_piles(screen, game.tableau, game.selected_card_pile,
-                       game.selected_stack_offset)
+                       game.selected_stack_offset, animations)
+
+    for image, coords in moving:
+        screen.blit(image, coords)
 
     draw_labels(screen, game.focus_coords)
 
     draw_library_count(screen, game.library)
 
-    game.update_money_displayed()
     draw_money(screen, game.money_displayed)
 
-    if game.menu:
-        draw_menu(screen, game.win, game.game_over, game.menu_index)
+    if game.menu or 'menu' in animations:
+        draw_menu(screen, game.win, game.game_over, game.menu_index,
+                  (1 - animations.get('menu', 1)) * (160 - MENU_COORDS.y))
 
 
 def draw_board(screen: pg.Surface):
@@ -101,9 +89,18 @@ def draw_board(screen: pg.Surface):
 
 
 def draw_card(screen: pg.Surface, card: Card, coords: pg.Vector2,
-              highlight: bool, draw_selection_top: bool):
+              highlight: bool, draw_selection_top: bool,
+              animations: Timeline | None = None) -> bool:
+    """Whether `card` is sliding, in which case it's drawn later"""
     rendered = render_card(card, highlight, draw_selection_top)
+
+    key = ('card', card.id)
+    if animations is not None and key in animations:  # <- Sliding there
+        moving.append((rendered, animations.get(key)))
+        return True
+
     screen.blit(rendered, coords)
+    return False
 
 
 def draw_card_slot(surface: pg.Surface, coords: pg.Vector2):
@@ -133,52 +130,36 @@ def draw_focus_box(surface: pg.Surface, color: pg.Color,
     pg.draw.line(surface, color, bottomleft + (0, -1), topleft + (0, 1))
 
 
-def draw_foundations(screen: pg.Surface, foundations: list[Pile]):
+def draw_foundations(screen: pg.Surface, foundations: list[Pile],
+                     animations: Timeline | None = None):
     for n in range(len(foundations)):
-        if foundations[n]:
-            draw_card(screen, foundations[n].get_top_card(),
-                      get_foundation_coords(n),
-                      foundations[n].get_top_card().selected, True)
+        draw_pile_top(screen, foundations[n], get_foundation_coords(n), True,
+                      animations)
 
 
 def draw_games_played(screen: pg.Surface, games: int):
-    screen.blit(GAME, GAME_LABEL)
     games_played = '%0*d' % (2, games)  # <- Zero-padding
-    game_count = pg.Surface((10, 6))
-    game_count.fill(BACKGROUND)
-    for n, char in enumerate(games_played):
-        game_count.blit(TEXT['money'][char]['pos'], (n * 5, 0))
-    screen.blit(game_count, GAME_LABEL + (7, 12))
+    screen.blit(render_text(games_played, 'money'), GAME_LABEL + (7, 12))
 
 
 def draw_labels(screen: pg.Surface, coords: pg.Vector2):
     if coords.y == 0:
         match coords.x:
             case 0:
-                screen.blit(LABEL_LIBRARY, LIBRARY + (2, -5))
+                screen.blit(ASSETS['label_library'], LIBRARY + (2, -5))
             case 1:
-                screen.blit(LABEL_GRAVEYARD, GRAVEYARD + (-1, -5))
+                screen.blit(ASSETS['label_graveyard'], GRAVEYARD + (-1, -5))
             case _:
-                screen.blit(LABEL_FOUNDATIONS, FOUNDATION_LABEL)
+                screen.blit(ASSETS['label_foundations'], FOUNDATION_LABEL)
 
 
 def draw_library_count(screen: pg.Surface, library: Pile):
     if library:
-        count = str(len(library))
-        count_bg = pg.Surface((12, 9))
-        count_bg.fill(COMMENT)
-        screen.blit(count_bg, LIBRARY + (5, 10))
-        count_image = count_bg.copy()
-        count_image.fill(FOREGROUND)
-        count_image.set_colorkey(FOREGROUND)
-        right_align = 7 if len(count) == 1 else 1
-        for n in range(len(count)):
-            count_image.blit(TEXT[count[n]]['black'], (5 * n + right_align, 1))
-
-        screen.blit(count_image, LIBRARY + (5, 10))
+        screen.blit(render_text(str(len(library)), 'badge'), LIBRARY + (5, 10))
 
 
-def draw_menu(screen: pg.Surface, win: bool, game_over: bool, menu_index: int):
+def draw_menu(screen: pg.Surface, win: bool, game_over: bool, menu_index: int,
+              offset: float = 0):
     if game_over or win:
         menu = pg.Surface((84, 51))  # <- 3-line menu
     else:
@@ -191,84 +172,92 @@ def draw_menu(screen: pg.Surface, win: bool, game_over: bool, menu_index: int):
                                           menu.get_height() - 4), 1)
 
     if win:
-        menu.blit(WINNER, (24, 8))
+        menu.blit(ASSETS['winner'], (24, 8))
         if menu_index:
-            menu.blit(NEXT_GAME, (5, 22))
-            menu.blit(START_OVER_SEL, (14, 35))
+            menu.blit(ASSETS['next_game'], (5, 22))
+            menu.blit(ASSETS['start_over_selected'], (14, 35))
         else:
-            menu.blit(NEXT_GAME_SEL, (5, 22))
-            menu.blit(START_OVER, (15, 35))
+            menu.blit(ASSETS['next_game_selected'], (5, 22))
+            menu.blit(ASSETS['start_over'], (15, 35))
     elif game_over:
-        menu.blit(BROKE, (26, 8))
+        menu.blit(ASSETS['broke'], (26, 8))
         if menu_index:
-            menu.blit(KEEP_PLAYING, (11, 22))
-            menu.blit(START_OVER_SEL, (15, 35))
+            menu.blit(ASSETS['keep_playing'], (11, 22))
+            menu.blit(ASSETS['start_over_selected'], (15, 35))
         else:
-            menu.blit(KEEP_PLAYING_SEL, (11, 22))
-            menu.blit(START_OVER, (15, 35))
+            menu.blit(ASSETS['keep_playing_selected'], (11, 22))
+            menu.blit(ASSETS['start_over'], (15, 35))
     else:
         if menu_index == 0:
-            menu.blit(NEXT_GAME_SEL, (5, 9))
-            menu.blit(START_OVER, (14, 22))
+            menu.blit(ASSETS['next_game_selected'], (5, 9))
+            menu.blit(ASSETS['start_over'], (14, 22))
         else:
-            menu.blit(NEXT_GAME, (5, 9))
-            menu.blit(START_OVER_SEL, (14, 22))
+            menu.blit(ASSETS['next_game'], (5, 9))
+            menu.blit(ASSETS['start_over_selected'], (14, 22))
 
-    screen.blit(menu, (78, 61))
+    screen.blit(menu, MENU_COORDS + (0, offset))  # <- Offset while sliding
 
 
 def draw_money(screen: pg.Surface, money: int):
-    chars = f'g{money}'
+    text = render_text(f'g{money}', 'loss' if money < 0 else 'money')
+    screen.blit(text, (237 - text.get_width(), 1))  # <- Right-aligned
 
-    for n, char in enumerate(chars[::-1]):
-        if char.isdigit():
-            screen.blit(TEXT['money'][char]['neg' if money < 0 else 'pos'],
-                        (233 - 5 * n, 1))
-        else:
-            screen.blit(TEXT['money'][char], (233 - 5 * n, 1))
+
+def draw_pile_top(screen: pg.Surface, pile: Pile, coords: pg.Vector2,
+                  draw_selection_top: bool,
+                  animations: Timeline | None = None):
+    """Top card of a squared-up pile, and the next one while it slides"""
+    for card in pile.cards[:-3:-1]:
+        if not draw_card(screen, card, coords, card.selected,
+                         draw_selection_top, animations):
+            break
 
 
 def draw_tableau_piles(screen: pg.Surface, tableau: list[Pile],
-                       selected_pile: Pile, offset: int):
+                       selected_pile: Pile, offset: int,
+                       animations: Timeline | None = None):
     for i, pile in enumerate(tableau):
-        total_height = 0
-
+        start = len(pile)  # <- First highlighted card
         if offset and pile == selected_pile:
-            highlighted_cards = pile[offset - 1:]
-        else:
-            highlighted_cards = []
-
-        for j, card in enumerate(pile):
-            if j > 0:
-                if pile[j - 1].is_face_up:
-                    total_height += STACK_HEIGHT
-                else:
-                    total_height += FACE_DOWN_HT
-
-            if card in highlighted_cards:
-                draw_card(screen, card,
-                      TABLEAU_1 + ((CARD_DIMS.x + GAP) * i, total_height),
-                      highlight=True,
-                      draw_selection_top=card == highlighted_cards[0])
-            else:
-                draw_card(screen, card,
-                          TABLEAU_1 + ((CARD_DIMS.x + GAP) * i, total_height),
-                          highlight=card.selected, draw_selection_top=True)
+            start -= len(pile[offset - 1:])
+
+        for card, coords, highlighted, selection_top in \
+                layout_tableau_pile(i, pile, start):
+            draw_card(screen, card, coords,
+                      highlight=highlighted or card.selected,
+                      draw_selection_top=selection_top,
+                      animations=animations)
 
 
 def draw_version_number(screen: pg.Surface, version_info: str):
-    for n, char in enumerate(f'v{version_info}'):
-        screen.blit(TEXT['version'][char], (n * 5 + 208, 151))
+    screen.blit(render_text(f'v{version_info}', 'version'), (208, 151))
+
+
+def layout_tableau_pile(i: int, pile: Pile, start: int) -> list[tuple]:
+    """
+    (card, coords, highlighted, selection top) for
+    each card in tableau pile `i`, with cards from
+    `start` on highlighted. Reused until the pile or
+    the selection changes; flips can't move anything,
+    as only a top card is ever flipped.
+    """
+    key = (pile, pile.version, start)
+    cached = tableau_layouts[i]
+    if cached is not None and cached[0] == key:
+        return cached[1]
 
+    spots = get_card_coords(pile)
+    layout = [(card, spots[j], j >= start, j <= start)
+              for j, card in enumerate(pile)]
 
-def get_foundation_coords(n: int) -> pg.Vector2:
-    return FOUNDATION_1 + ((CARD_DIMS.x + GAP) * n, 0)
+    tableau_layouts[i] = (key, layout)
+    return layout
 
 
 def load_card_text():
     global TEXT
 
-    font = pg.image.load(assets / 'font.bmp')
+    font = ASSETS['font']
     text = {}
 
     for n in range(0, 14):
@@ -332,22 +321,98 @@ def load_card_text():
             text['version'][str(n)] = temp
 
     TEXT = text
+    render_background.cache_clear()
+    render_card_state.cache_clear()
+    render_text.cache_clear()
+
+
+@lru_cache(maxsize=64)
+def render_text(string: str, style: str) -> pg.Surface:
+    """
+    A whole string of TEXT glyphs as one surface.
+    Styles: 'money' and 'loss' (red digits),
+    'version', 'black' (rank glyphs, light parts
+    see-through) and 'badge' (the library count)
+    """
+    if style == 'badge':
+        badge = pg.Surface((12, 9))
+        badge.fill(COMMENT)
+        badge.blit(render_text(string, 'black'),
+                   (7 if len(string) == 1 else 1, 1))  # <- Right-aligned
+        return badge
+
+    if style == 'black':
+        glyphs = [TEXT[char]['black'] for char in string]
+        key = FOREGROUND
+    elif style == 'version':
+        glyphs = [TEXT['version'][char] for char in string]
+        key = TRANSPARENT
+    else:
+        shade = 'neg' if style == 'loss' else 'pos'
+        glyphs = [TEXT['money'][char][shade] if char.isdigit()
+                  else TEXT['money'][char] for char in string]
+        key = TRANSPARENT
+
+    width, height = glyphs[0].get_size()
+    surface = pg.Surface((5 * (len(glyphs) - 1) + width, height))
+    surface.fill(key)  # <- Gaps between glyphs show through
+    for n, glyph in enumerate(glyphs):
+        surface.blit(glyph, (5 * n, 0))
+    surface.set_colorkey(key)
+
+    return surface
+
+
+@lru_cache(maxsize=1)
+def render_background(size: tuple[int, int], version_info: str) -> pg.Surface:
+    """Everything that never changes during play: card slots and labels"""
+    background = pg.Surface(size)
+    background.fill(BACKGROUND)
+
+    draw_board(background)
+    background.blit(ASSETS['game'], GAME_LABEL)
+    draw_version_number(background, version_info)
+
+    return background
 
 
 def render_card(card: Card, highlight: bool,
                 draw_selection_top: bool) -> pg.Surface:
-    surface = CARD_IMG.copy() if card.is_face_up else CARD_BACK_IMG.copy()
+    """
+    Shared, cached surface for the card's current
+    look; blit it, don't draw on it
+    """
+    if highlight:
+        focused = False  # <- Highlight box replaces the focus box
+    else:
+        focused = card.focused
+        draw_selection_top = True
+
+    if card.is_face_up:
+        return render_card_state(card.display_rank, card.suit, card.color,
+                                 focused, highlight, draw_selection_top)
+    else:
+        return render_card_state(None, None, None, focused, highlight,
+                                 draw_selection_top)
+
+
+@lru_cache(maxsize=256)  # <- 52 cards x 4 looks, plus card backs
+def render_card_state(display_rank: str | None, suit: str | None,
+                      color: str | None, focused: bool, highlight: bool,
+                      draw_selection_top: bool) -> pg.Surface:
+    """Render a card; a face-down card has no rank, suit or color"""
+    surface = ASSETS['card' if display_rank else 'card_back'].copy()
 
     if highlight:
         draw_focus_box(surface, GREEN, complete=draw_selection_top)
-    elif card.focused:
+    elif focused:
         draw_focus_box(surface, ORANGE, complete=True)
 
-    if card.is_face_up:
+    if display_rank:
         rank_target = (2, 2)
-        suit_target = (13, 2) if card.rank == 10 else (8, 2)
-        surface.blit(TEXT[str(card.display_rank)][card.color], rank_target)
-        surface.blit(TEXT[card.suit], suit_target)
+        suit_target = (13, 2) if display_rank == '10' else (8, 2)
+        surface.blit(TEXT[display_rank][color], rank_target)
+        surface.blit(TEXT[suit], suit_target)
 
     return surface
 
@@ -0,0 +1,113 @@
+"""
+Next-move hints from the solver, searched on a
+worker thread so the frame loop never waits on it
+for longer than a fixed budget.
+"""
+from threading import Event, Thread
+from time import sleep
+
+from rules import Klondike
+from solver import Solver
+
+
+HINT_NODES  = 20_000  # <- Search size; a position always gets the same hint
+FRAME_NODES = 400  # <- Search size without a thread, well inside one frame
+HINT_BUDGET = 0.02  # <- Seconds a hint waits for an unfinished search,
+                    #    well inside one 30 fps frame
+SLICE_NODES = 256  # <- Nodes between progress samples
+
+
+class HintSearch():
+    """
+    One anytime search of one position. Until the
+    solver finishes, the best move is the first move
+    of the line that got furthest (fewest face-down
+    cards, then most foundation cards).
+    """
+    def __init__(self, game: Klondike, max_nodes: int = HINT_NODES):
+        self.solver = Solver(game, table_size=max_nodes)
+        self.key = self.solver.hash
+        self.max_nodes = max_nodes
+        self.done = not game.rules.classic  # <- No hints for variants the
+                                            #    solver doesn't play
+        self.moves = [] if self.done else self.solver.ordered_moves()
+        self.scores = {}  # <- First move -> best progress seen below it
+        self.move = self.moves[0] if self.moves else None
+
+    def run(self, cancelled: Event | None = None):
+        if self.done:
+            return
+
+        for result in self.solver.search(self.max_nodes,
+                                         slice_nodes=SLICE_NODES):
+            if cancelled is not None:
+                if cancelled.is_set():
+                    return
+                sleep(0)  # <- Hand the GIL back to the frame loop
+
+            if result is None:
+                self.sample()
+            elif result.moves:
+                self.move = result.moves[0]
+
+        self.done = True
+
+    def sample(self):
+        if not self.solver.path:
+            return
+
+        move = self.solver.path[0][0]
+        score = (-sum(self.solver.hidden), sum(self.solver.foundations))
+        if move in self.scores and self.scores[move] >= score:
+            return
+
+        self.scores[move] = score
+        self.move = max(self.moves,
+                        key=lambda m: self.scores.get(m, (-99, 0)))
+
+
+class HintEngine():
+    """
+    Keeps a search of the current position running.
+    With `threaded` off, or a `budget` of None, a
+    hint waits for the whole search, so it only
+    depends on the position (replays need this).
+    """
+    def __init__(self, threaded: bool = True,
+                 budget: float | None = HINT_BUDGET,
+                 max_nodes: int = HINT_NODES):
+        self.threaded = threaded
+        self.budget = budget
+        self.max_nodes = max_nodes
+        self.search = None
+        self.thread = None
+        self.cancelled = Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def hint(self, game: Klondike) -> tuple[int, int, int] | None:
+        """Best move found so far for `game`, as (source, depth, target)"""
+        self.update(game)
+        if self.thread is None:
+            if not self.search.done:
+                self.search.run()
+        else:
+            self.thread.join(self.budget)
+
+        return self.search.move
+
+    def update(self, game: Klondike):
+        """Start searching `game`, unless its position is already known"""
+        search = HintSearch(game, self.max_nodes)
+        if self.search is not None and self.search.key == search.key:
+            return
+
+        self.cancel()
+        self.search = search
+        self.thread = None
+        if self.threaded:
+            self.cancelled = Event()
+            self.thread = Thread(target=search.run, args=(self.cancelled,),
+                                 daemon=True)
+            self.thread.start()
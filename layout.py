@@ -0,0 +1,53 @@
+"""
+Where cards sit on the 240x160 screen, shared by
+gfx, which draws them there, and logic, which
+slides a card when its spot changes.
+"""
+import pygame as pg
+
+import rules
+
+
+# Borders and anchor points
+PADDING      = 6
+GAP          = 5
+STACK_HEIGHT = 9
+FACE_DOWN_HT = 4
+CARD_DIMS    = pg.Vector2(27, 35)
+LIBRARY      = pg.Vector2(PADDING, PADDING + 2)
+GRAVEYARD    = pg.Vector2(PADDING + CARD_DIMS.x + GAP, PADDING + 2)
+FOUNDATION_1 = pg.Vector2(PADDING + (CARD_DIMS.x + GAP) * 3, PADDING + 2)
+TABLEAU_1    = LIBRARY + (0, CARD_DIMS.y + PADDING)
+
+
+def get_card_coords(pile: rules.Pile) -> list[pg.Vector2]:
+    """Where each card in `pile` is drawn, bottom up"""
+    coords = get_pile_coords(pile.index)
+    if pile.kind != rules.TABLEAU_KIND:
+        return [coords] * len(pile)
+
+    spots = []
+    for j, card in enumerate(pile):
+        if j > 0:
+            coords = coords + (0, STACK_HEIGHT if pile[j - 1].is_face_up
+                               else FACE_DOWN_HT)
+        spots.append(coords)
+
+    return spots
+
+
+def get_foundation_coords(n: int) -> pg.Vector2:
+    return FOUNDATION_1 + ((CARD_DIMS.x + GAP) * n, 0)
+
+
+def get_pile_coords(index: int) -> pg.Vector2:
+    """Top left of `piles[index]`"""
+    if index == rules.LIBRARY:
+        return LIBRARY
+    elif index == rules.GRAVEYARD:
+        return GRAVEYARD
+    elif index in rules.FOUNDATIONS:
+        return get_foundation_coords(index - rules.FOUNDATIONS[0])
+    else:
+        return TABLEAU_1 + ((CARD_DIMS.x + GAP) * (index - rules.TABLEAU[0]),
+                            0)
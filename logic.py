@@ -1,36 +1,39 @@
-from random import sample
-from typing import Iterator, Optional
+from typing import Optional
 
 import pygame as pg
 
+import rules
 
-class Card():
+from anim import Timeline
+from hint import FRAME_NODES, HintEngine
+from layout import get_card_coords
+from rules import (FOUNDATIONS, GRAVEYARD, LIBRARY, TABLEAU, TABLEAU_KIND,
+                   Klondike, Rules)
+
+
+AUTOCOMPLETE_TIME = 1 / 30  # <- Seconds between auto-complete moves
+MONEY_RATE        = 200  # <- G per second the money display counts
+MONEY_TIME        = 1.0  # <- Longest count, in seconds
+SLIDE_TIME        = 0.12  # <- Seconds for a card to reach its new spot
+MENU_TIME         = 0.15
+
+
+class Card(rules.Card):
     def __init__(self, suit: str, rank: int):
-        self.suit = suit
-        self.rank = rank
-        self.color = 'red' if self.suit in ['hearts', 'diamonds'] else 'black'
-        self.is_face_up = False
-        self.display_rank = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10',
-                             'J', 'Q', 'K'][self.rank - 1]
+        super().__init__(suit, rank)
         self.focused = False
         self.selected = False
 
-    def __repr__(self) -> str:
-        return f'{self.display_rank}{self.suit[0]}'
-
     def deselect(self):
         self.selected = False
 
-    def flip(self):
-        self.is_face_up = not self.is_face_up
-
     def focus(self):
         self.focused = True
 
     def reset(self):
+        super().reset()
         self.focused = False
         self.selected = False
-        self.is_face_up = False
 
     def select(self):
         self.selected = True
@@ -39,37 +42,15 @@ class Card():
         self.focused = False
 
 
-class Pile():
+class Pile(rules.Pile):
     def __init__(self, name: str):
-        self.name = name
+        super().__init__(name)
 
-        self.cards = []
         self.empty_focused = False
         self.has_focus = False  # <- Set during initial "get focus" event
 
-    def __bool__(self) -> bool:
-        return bool(self.cards)
-
-    def __getitem__(self, index: int) -> Card:
-        return self.cards[index]
-
-    def __iter__(self) -> Iterator:
-        return iter(self.cards)
-
-    def __len__(self) -> int:
-        return len(self.cards)
-
-    def __repr__(self) -> str:
-        return f'{self.name} ({len(self.cards)} cards): {self.cards}'
-
-    def draw(self) -> Card | None:
-        if self.cards:
-            return self.cards.pop()
-        else:
-            return None
-
     def focus(self, stack_offset: int = 0) -> Card|None:
-        if self.get_type() == 'tableau':
+        if self.get_type() == TABLEAU_KIND:
             if self.cards:
                 self.empty_focused = False
 
@@ -92,30 +73,6 @@ class Pile():
                 self.empty_focused = True
                 return None
 
-    def get_card_with_offset(self, offset: int) -> Card|None:
-        try:
-            return self.cards[len(self.cards) - 1 + offset]
-        except IndexError:
-            return None
-
-    def get_type(self) -> str:
-        return self.name.split(' ')[0].lower()
-
-    def get_top_card(self) -> Card|None:
-        try:
-            return self.cards[-1]
-        except IndexError:
-            return None
-
-    def place(self, card: Card):
-        self.cards.append(card)
-
-    def pop(self, index: int = -1) -> Card:
-        return self.cards.pop(index)
-
-    def shuffle(self):
-        self.cards = sample(self.cards, k=len(self.cards))
-
     def unfocus(self, stack_offset: int):
         self.empty_focused = False
         self.has_focus = False
@@ -125,24 +82,29 @@ class Pile():
             self.cards[focused_index].unfocus()
 
 
-class Game():
-    def __init__(self):
-        self.bank = 100
-        self.face_down_cards = 0
-        self.game_earnings = 0
+class Game(Klondike):
+    card_class = Card
+    pile_class = Pile
+
+    def __init__(self, seed: int | None = None, deals=None,
+                 winnable_only: bool = False, rules: Rules | None = None):
+        self.animations = Timeline()
+        self.autocomplete = []  # <- Moves left to play, last one first
+        self.card_spots = {}  # <- Card id -> screen coords, for slides
         self.game_over = False
-        self.games = 0
+        self.hints = HintEngine(threaded=False, max_nodes=FRAME_NODES)
         self.menu = False
         self.menu_index = 0
-        self.money = 0
+        self.menu_shown = False  # <- Menu state the last slide went to
         self.money_displayed = 100
-        self.piles = []
+        self.pile_versions = [None] * 13  # <- As of the last place_cards
+        self.recorder = None  # <- main.py sets a replay.Recorder to log deals
         self.running = True
         self.selected_card = None
         self.selected_card_pile = None
-        self.win = False
+        self.stats = None  # <- main.py sets a stats.Stats to save results
 
-        self.new()
+        super().__init__(seed, deals, winnable_only, rules)
 
         self.focus_coords = pg.Vector2(0, 0)
         self.focus_areas = [
@@ -153,18 +115,16 @@ class Game():
         self.selected_stack_offset = 0
 
         self.move_focus(pg.Vector2(0, 0))
+        self.place_cards(slide=False)
 
     def check_win(self):
-        self.update_money()
-
-        if self.face_down_cards == 0:
-            if not self.win:
-                self.win = True
-                self.game_earnings = 5 * 52
-                self.update_money()
+        super().check_win()
 
+        if self.win:
             self.game_over = False
-            self.menu = True
+            if not self.autocomplete:
+                self.autocomplete = self.autocomplete_moves()[::-1]
+            self.menu = not self.autocomplete  # <- Once the cards are home
         else:
             if self.money <= 0 and self.menu:
                 self.game_over = True
@@ -176,19 +136,6 @@ class Game():
         self.focus_stack_offset = 0
         self.selected_stack_offset = 0
 
-    def deal(self):
-        for i in range(7):
-            for j in range(i, 7):
-                self.tableau[j].place(self.library.draw())
-                self.face_down_cards += 1
-
-        for pile in self.tableau:
-            pile.get_top_card().flip()
-            self.face_down_cards -= 1
-
-        self.update_money()
-        self.games += 1
-
     def deselect(self):
         if self.selected_card:
             self.selected_card.deselect()
@@ -197,40 +144,38 @@ class Game():
         self.selected_card_pile = None
 
     def draw(self):
-        if self.library:  # <- Handle empty library
-            self.graveyard.place(self.library.draw())
-            self.graveyard.get_top_card().flip()
-            self.set_focus(pg.Vector2(1, 0))
-        else:
-            if 0:  # TODO: Add this option in a menu?
-                self.recycle_library()
-                self.set_focus(pg.Vector2(0, 0))
+        if super().draw():  # <- False with nothing to draw or recycle
+            self.set_focus(pg.Vector2(1 if self.graveyard else 0, 0))
 
         self.deselect()
 
     def flip_card_above_selected(self):
-        revealed_card = self.selected_card_pile.get_top_card()
-        if revealed_card:
-            if not revealed_card.is_face_up:
-                revealed_card.flip()
-                self.face_down_cards -= 1
-
-                self.check_win()
+        self.reveal(self.selected_card_pile)
 
     def get_focused_pile(self) -> Pile:
         return self.focus_areas[
             int(self.focus_coords.y)][int(self.focus_coords.x)
         ]
 
-    def get_foundation_cards(self) -> list[Card]:
-        cards = []
-        for pile in self.piles:
-            if pile.get_type() == 'foundation':
-                cards += pile.cards
-
-        return cards
+    def get_pile_coords(self, index: int) -> pg.Vector2:
+        """Focus coordinates of `piles[index]`"""
+        if index in [LIBRARY, GRAVEYARD]:
+            return pg.Vector2(index, 0)
+        elif index in FOUNDATIONS:
+            return pg.Vector2(index + 1, 0)  # <- Skip the gap
+        else:
+            return pg.Vector2(index - TABLEAU[0], 1)
 
     def handle_button_press(self, pressed: str):
+        if self.autocomplete:  # <- Any button skips to the end
+            while self.autocomplete:
+                self.play_autocomplete_move()
+            self.skip_animations()
+            self.place_cards()
+            return
+
+        self.skip_animations()
+
         match pressed:
             case 'A':
                 self.press_A()
@@ -239,7 +184,7 @@ class Game():
             case 'X':
                 self.press_X()
             case 'Y':
-                pass
+                self.press_Y()
             case 'L2':
                 self.press_L2()
             case 'R2':
@@ -254,39 +199,18 @@ class Game():
                 self.press_RIGHT()
             case 'START':
                 self.press_START()
+            case 'SELECT':
+                self.press_SELECT()
+            case 'HOME':
+                self.press_HOME()
             case _:
                 print(f'Unhandled button press: {pressed}')
 
-    def init_library(self):
-        for suit in ['hearts', 'clubs', 'diamonds', 'spades']:
-            for rank in range(1, 14):
-                self.library.cards.append(Card(suit, rank))
-
-    def is_legal_move(self, card: Card, target: Pile) -> bool:
-        if target.get_type() == 'foundation':
-            if self.selected_stack_offset:
-                return False  # <- Can't move multiple cards to a foundation!
-            if target.cards:
-                top_card = target.get_top_card()
-                if card.suit == top_card.suit and \
-                    card.rank == top_card.rank + 1:
-                    return True
-            elif card.rank == 1:
-                return True
-        elif target.get_type() == 'tableau':
-            if card.rank == 1:  # <- Can't put Aces on tableau piles
-                return False
-
-            top_card = target.get_top_card()
-            if top_card:
-                if top_card.color != card.color and \
-                card.rank == top_card.rank - 1:
-                    return True
-            else:
-                if card.rank == 13:  # <- King to empty tableau
-                    return True
+        self.place_cards()
 
-        return False
+    def is_animating(self) -> bool:
+        return bool(self.autocomplete) or not self.animations.idle \
+            or self.money_displayed != self.money
 
     def move_focus(self, direction: pg.Vector2):
         self.get_focused_pile().unfocus(self.focus_stack_offset)
@@ -321,61 +245,74 @@ class Game():
 
         target_pile.unfocus(self.focus_stack_offset)
 
-        if self.selected_stack_offset:
-            while self.selected_stack_offset < 0:
-                target_pile.place(
-                    self.selected_card_pile.pop(self.selected_stack_offset - 1))
-                self.selected_stack_offset += 1
-
-        target_pile.place(self.selected_card_pile.pop())
+        self.transfer(self.selected_card_pile, 1 - self.selected_stack_offset,
+                      target_pile)
         self.selected_card_pile.unfocus(self.focus_stack_offset)
         self.clear_stack_offsets()
         self.update_focus()
 
-        self.update_money()
-
-    def new(self):
-        self.library     = Pile('Library')
-        self.graveyard   = Pile('Graveyard')
-        self.tableau     = [Pile(f'Tableau {n}') for n in range(7)]
-        self.foundations = [Pile(f'Foundation {n}') for n in range(4)]
-        self.piles = [self.library, self.graveyard] + self.foundations \
-                    + self.tableau
-
-        self.init_library()
-        self.library.shuffle()
-        self.deal()
+    def next_game(self, seed: int | None = None):
+        if self.games:  # <- Not the deal after start_over, already saved
+            self.save_result()
 
-    def next_game(self):
         self.menu = False
-        self.bank += self.game_earnings
-        self.game_earnings = 0
         self.game_over = False
-        self.win = False
 
         if self.focused_card:
             self.focused_card.unfocus()
 
-        self.face_down_cards = 0
         self.focus_stack_offset = 0
         self.deselect()
 
-        for pile in self.piles[1:]:  # <- Don't collect from library
-            while pile.cards:
-                card = pile.pop()
-                card.reset()
-                self.library.place(card)
-
-        self.library.shuffle()
-        self.deal()
+        super().next_game(seed)
+        if self.recorder is not None:
+            self.recorder.deal(self.seed)
 
         self.set_focus(pg.Vector2(0, 0))
+        self.place_cards(slide=False)  # <- Nothing slides into a new deal
 
     def offset_focus(self, offset: int):
         self.get_focused_pile().get_card_with_offset(
             self.focus_stack_offset).unfocus()
         self.focus_stack_offset += offset
 
+    def place_cards(self, slide: bool = True):
+        """
+        Note where the cards of every changed pile are
+        drawn, sliding the ones that moved and the menu
+        if it opened or closed. Called as the state
+        changes, so every caller steps the same tweens.
+        """
+        animations = self.animations
+        for pile in self.piles:
+            if self.pile_versions[pile.index] == pile.version:
+                continue
+
+            self.pile_versions[pile.index] = pile.version
+            for card, coords in zip(pile.cards, get_card_coords(pile)):
+                key = ('card', card.id)
+                spot = self.card_spots.get(card.id)
+                if slide and spot is not None and spot != coords:
+                    animations.add(key, animations.get(key, spot), coords,
+                                   SLIDE_TIME)
+                self.card_spots[card.id] = coords
+
+        if self.menu != self.menu_shown:
+            self.menu_shown = self.menu
+            if slide:
+                animations.add('menu', animations.get('menu', 1 - self.menu),
+                               int(self.menu), MENU_TIME)
+
+    def play_autocomplete_move(self):
+        self.get_focused_pile().unfocus(self.focus_stack_offset)
+        self.deselect()
+        self.clear_stack_offsets()
+
+        self.move(*self.autocomplete.pop())
+        self.update_focus()
+        if not self.autocomplete:
+            self.check_win()  # <- Brings up the menu
+
     def press_A(self):
         if self.menu:
             if self.win:
@@ -398,9 +335,10 @@ class Game():
                 self.deselect()
             else:
                 if self.is_legal_move(self.selected_card,
-                                      self.get_focused_pile()):
+                                      self.get_focused_pile(),
+                                      1 - self.selected_stack_offset):
                     self.move_selected_card()
-                    if self.selected_card_pile.get_type() == 'tableau':
+                    if self.selected_card_pile.get_type() == TABLEAU_KIND:
                         self.flip_card_above_selected()  # <- Don't flip cards
                                                          #    in graveyard!
                 self.deselect()
@@ -423,7 +361,7 @@ class Game():
             return
 
         focused_pile = self.get_focused_pile()
-        if focused_pile.cards and focused_pile.get_type() == 'tableau':
+        if focused_pile.cards and focused_pile.get_type() == TABLEAU_KIND:
             if focused_pile == self.selected_card_pile:
                 self.move_focus(pg.Vector2(0, 1))
                 return
@@ -437,6 +375,10 @@ class Game():
         else:
             self.move_focus(pg.Vector2(0, 1))
 
+    def press_HOME(self):
+        if not self.menu:
+            self.step_history(self.redo)
+
     def press_L2(self):
         if not self.menu:
             self.draw()
@@ -453,6 +395,10 @@ class Game():
         if not self.menu:
             self.move_focus(pg.Vector2(1, 0))
 
+    def press_SELECT(self):
+        if not self.menu:
+            self.step_history(self.undo)
+
     def press_START(self):
         self.toggle_menu()
 
@@ -462,7 +408,7 @@ class Game():
             return
 
         focused_pile = self.get_focused_pile()
-        if focused_pile.cards and focused_pile.get_type() == 'tableau':
+        if focused_pile.cards and focused_pile.get_type() == TABLEAU_KIND:
             if focused_pile == self.selected_card_pile:
                 self.move_focus(pg.Vector2(0, -1))
                 return
@@ -484,7 +430,7 @@ class Game():
         self.deselect()
 
         pile = self.get_focused_pile()
-        if pile.get_type() == 'tableau':
+        if pile.get_type() == TABLEAU_KIND:
             if len(pile) == 1:
                 self.select(pile)
             elif len(pile) > 1:
@@ -494,16 +440,28 @@ class Game():
                 self.update_focus()
                 self.select(self.focused_card)
 
+    def press_Y(self):
+        """Focus the card(s) the hint engine would move next"""
+        if self.menu:
+            return
+
+        move = self.hints.hint(self)
+        if move is None:
+            return
+
+        source, depth, _ = move
+        self.deselect()
+        self.set_focus(self.get_pile_coords(source))
+        if depth > 1:
+            self.offset_focus(1 - depth)
+            self.update_focus()
+
     def quit(self):
         self.running = False
 
-    def recycle_library(self):
-        """Not used in Vegas style Klondike"""
-        while self.graveyard:
-            card = self.graveyard.pop()
-            card.flip()
-            card.unfocus()
-            self.library.place(card)
+    def save_result(self):
+        if self.stats is not None:
+            self.stats.record(self)
 
     def select(self, to_select: Card|Pile):
         if isinstance(to_select, Pile):
@@ -517,45 +475,68 @@ class Game():
 
     def set_focus(self, coords: pg.Vector2):
         self.get_focused_pile().unfocus(self.focus_stack_offset)
+        self.focus_stack_offset = 0  # <- Means nothing on the new pile
         self.focus_coords = coords
         self.move_focus(pg.Vector2(0, 0))
 
     def shortcut_to_foundation(self):
         if self.focused_card:
             if self.focused_card.is_face_up:
-                for foundation in self.foundations:
-                    if self.is_legal_move(self.focused_card, foundation):
-                        self.select(self.focused_card)
-                        self.move_selected_card(foundation)
-                        if self.selected_card_pile.get_type() == 'tableau':
-                            self.flip_card_above_selected()
+                foundation = self.foundation_for(self.focused_card)
+                if foundation is not None and self.is_legal_move(
+                    self.focused_card, foundation,
+                    1 - self.focus_stack_offset):  # <- Not partway down a stack
+                    self.select(self.focused_card)
+                    self.move_selected_card(foundation)
+                    if self.selected_card_pile.get_type() == TABLEAU_KIND:
+                        self.flip_card_above_selected()
+
+                    self.selected_card.unfocus()
+                    self.deselect()
+
+    def step_history(self, step):
+        """Undo or redo, leaving focus on the same pile"""
+        self.get_focused_pile().unfocus(self.focus_stack_offset)
+        self.deselect()
+        self.clear_stack_offsets()
+
+        step()
+        self.update_focus()
 
-                        self.selected_card.unfocus()
-                        self.deselect()
-                        break
+    def skip_animations(self):
+        self.animations.skip()
+        self.money_displayed = self.money
 
     def start_over(self):
-        self.bank = 100
+        self.save_result()
         self.money_displayed = 100
-        self.games = 0
-        self.game_earnings = 0
-        self.next_game()
+        super().start_over()
 
     def toggle_menu(self):
         self.menu_index = 0
         self.menu = not self.menu
         self.check_win()
 
+    def update(self):
+        """Advance one fixed step (anim.STEP seconds)"""
+        self.animations.step()
+        if self.autocomplete and 'autocomplete' not in self.animations:
+            self.play_autocomplete_move()
+            self.animations.add('autocomplete', 0, 1, AUTOCOMPLETE_TIME)
+            self.place_cards()
+
+        self.update_money_displayed()
+
     def update_focus(self):
         self.focused_card = self.get_focused_pile().focus(
             self.focus_stack_offset)
 
-    def update_money(self):
-        self.game_earnings = -52 + 5 * len(self.get_foundation_cards())
-        self.money = self.bank + self.game_earnings
-
     def update_money_displayed(self):
-        if self.money_displayed < self.money:
-            self.money_displayed += 1
-        elif self.money_displayed > self.money:
-            self.money_displayed -= 1
+        tween = self.animations.tweens.get('money')
+        if self.money != (self.money_displayed if tween is None else tween.end):
+            self.animations.add('money', self.money_displayed, self.money,
+                                min(MONEY_TIME,
+                                    abs(self.money - self.money_displayed)
+                                    / MONEY_RATE))
+
+        self.money_displayed = round(self.animations.get('money', self.money))
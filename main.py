@@ -1,46 +1,169 @@
+import argparse
+
+from pathlib import Path
+
 import pygame as pg
 
 import gfx
 
+from dealdb import DealDatabase
 from gamepad import Gamepad
+from hint import HintEngine
 from logic import Game
+from profiler import FrameProfiler
+from replay import Recorder
+from rules import SCORING, Rules
+from stats import Stats
 
 
 VERSION = '1.0.0'
+IDLE_TIMEOUT = 1000  # <- ms to block for input before checking again
 
 
-def main():
+def main(seed: int | None = None, deals: DealDatabase | None = None,
+         winnable_only: bool = False, idle: bool = False,
+         profiler: FrameProfiler | None = None, record: Path | None = None,
+         stats: Stats | None = None, rules: Rules | None = None):
+    """
+    With `idle`, block on input and only redraw when
+    something changed, keeping timed frames while
+    anything is still animating.
+    """
     screen_dims = (240, 160)
     screen = pg.display.set_mode(screen_dims, pg.SCALED)
     clock = pg.time.Clock()
     gfx.load_card_text()
 
-    game = Game()
+    game = Game(seed, deals, winnable_only, rules)
     gamepad = Gamepad()
 
+    if profiler is None:
+        profiler = FrameProfiler(enabled=False)
+    profiler.wrap(gfx)
+
+    recorder = Recorder(record, game) if record else None
+    game.recorder = recorder
+
+    game.stats = stats
+    if stats:
+        stats.restore(game)
+        game.skip_animations()
+
+    # Recordings keep Game's unthreaded hints, which don't depend on
+    # timing and search few enough nodes to fit in a frame
+    if not record:
+        game.hints = HintEngine()
+    game.hints.update(game)
+
+    dirty = True
+    steps = 0  # <- Fixed updates so far; presses are recorded against it
     while game.running:
-        clock.tick(30)
+        if idle and not dirty and not profiler.enabled:
+            events = [pg.event.wait(IDLE_TIMEOUT)] + pg.event.get()
+            clock.tick()
+            elapsed = 0  # <- Nothing was animating while we slept
+        else:
+            elapsed = clock.tick(30) / 1000
+            profiler.start_frame()
+            with profiler.stage('events'):
+                events = pg.event.get()
+
+        with profiler.stage('gamepad'):
+            ticks = pg.time.get_ticks()
+            for event in events:
+                if event.type in [pg.WINDOWEXPOSED, pg.WINDOWRESTORED]:
+                    dirty = True
+                elif event.type == pg.QUIT:
+                    game.quit()
+                else:  # <- SDL's own stamp, when pygame passes it on
+                    gamepad.handle_event(event,
+                                         event.dict.get('timestamp', ticks))
+
+            presses = gamepad.get_button_presses()
 
-        for event in pg.event.get():
-            if event.type == pg.QUIT:
-                game.quit()
-            elif event.type == pg.JOYBUTTONDOWN:
-                gamepad.handle_button_press(event.button)
-            elif event.type == pg.JOYHATMOTION:  # <- DPAD buttons
-                if event.value != (0, 0):  # <- Ignore DPAD "release" events
-                    gamepad.handle_dpad_press(event.value)
-            elif event.type == pg.JOYAXISMOTION:
-                gamepad.handle_joyaxis(event.axis, event.value)
+        if presses:
+            with profiler.stage('game'):
+                for pressed, ticks in presses:
+                    if recorder:
+                        recorder.record(steps, pressed)
+                    game.handle_button_press(pressed)
+                    profiler.input(ticks)
+                game.hints.update(game)  # <- Search the new position early
+            dirty = True
 
-        pressed = gamepad.get_button_press()
-        if pressed:
-            game.handle_button_press(pressed)
+        with profiler.stage('game'):
+            for _ in range(game.animations.advance(elapsed)):
+                game.update()
+                steps += 1
 
-        gfx.draw(screen, game, VERSION)
-        pg.display.flip()
+        if dirty or not idle or profiler.enabled:
+            gfx.draw(screen, game, VERSION)
+            profiler.draw_overlay(screen)
+            with profiler.stage('flip'):
+                pg.display.flip()
+            profiler.flipped()
+            profiler.end_frame()
+
+        dirty = game.is_animating()
+
+    game.hints.cancel()
+    if stats:
+        game.save_result()  # <- Quitting ends the game in progress
+        stats.close()
+    profiler.close()
+    if recorder:
+        recorder.close(steps, game)
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--deal', type=int, default=None,
+                        help='deal number to start with')
+    parser.add_argument('--deals', type=Path, default=None,
+                        help='deal database built with dealdb.py')
+    parser.add_argument('--winnable', action='store_true',
+                        help='only deal games the database marks winnable')
+    parser.add_argument('--idle', action='store_true',
+                        help='sleep until input instead of drawing 30 fps')
+    parser.add_argument('--profile', action='store_true',
+                        help='time each frame stage and show an overlay')
+    parser.add_argument('--profile-csv', type=Path, default=None,
+                        help='also write every frame\'s timings to this file')
+    parser.add_argument('--record', type=Path, default=None,
+                        help='save every button press for replay.py')
+    parser.add_argument('--save-dir', type=Path, default=Path('save'),
+                        help='where results and high scores are kept')
+    parser.add_argument('--no-save', action='store_true',
+                        help='don\'t load or save results')
+    parser.add_argument('--draw', type=int, default=1, choices=[1, 3],
+                        help='cards turned from the library at a time')
+    parser.add_argument('--passes', type=int, default=1,
+                        help='times through the library, 0 for no limit')
+    parser.add_argument('--scoring', choices=SCORING, default='cumulative',
+                        help='vegas starts every deal from G100')
+    parser.add_argument('--any-card-on-empty', action='store_true',
+                        help='let any card, not just Kings, fill a column')
+    args = parser.parse_args()
+
+    rules = Rules(args.draw, args.passes or None, args.scoring,
+                  not args.any_card_on_empty)
+    if args.record and rules != Rules():
+        parser.error('recordings only replay with the standard rules')
+
+    deals = DealDatabase(args.deals) if args.deals else None
+    if deals is not None and not deals:
+        parser.error(f'{args.deals} holds no deals')
+    if args.winnable and (deals is None
+                          or deals.next_winnable(deals.first) is None):
+        parser.error('--winnable needs a deal database with winnable deals')
+
+    profiler = FrameProfiler(args.profile or bool(args.profile_csv),
+                             csv_path=args.profile_csv)
+
     pg.init()
     pg.display.set_caption('GBA Klondike')
-    main()
+    stats = None if args.no_save or args.record \
+        else Stats(args.save_dir, args.scoring)
+
+    main(args.deal, deals, args.winnable, args.idle, profiler, args.record,
+         stats, rules)
@@ -0,0 +1,201 @@
+import csv
+import functools
+
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from time import perf_counter
+from types import ModuleType
+
+import pygame as pg
+
+
+OVERLAY_ROWS    = 12  # <- Slowest stages shown, after the frame total
+OVERLAY_REFRESH = 15  # <- Frames between overlay redraws
+FRAME_BUDGET    = 1000 / 30  # <- ms
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class FrameProfiler():
+    """
+    Times named stages of each frame, keeping the
+    last `window` frames for p50/p95/p99 and
+    optionally streaming every frame to a CSV file.
+    A disabled profiler costs one call per stage.
+    The 'input' row is the time from each press to
+    the flip that first shows it, one sample per
+    press (the CSV keeps each frame's oldest). When
+    an event has no SDL timestamp, as in pygame 2,
+    a press is stamped as its frame reads events,
+    which can read up to a frame low.
+    """
+    def __init__(self, enabled: bool = True, window: int = 300,
+                 csv_path: Path | None = None):
+        self.enabled = enabled
+        self.window = window
+        self.frame = 0
+        self.current = {}
+        self.samples = {}
+        self.names = ['frame', 'input']  # <- Input rows are often blank
+        self.frame_start = perf_counter()
+        self.input_ticks = []  # <- Presses not yet on screen
+
+        self.csv_file = open(csv_path, 'w+', newline='') if csv_path else None
+        self.csv_writer = None
+
+        self.overlay = None
+        self.font = None
+
+    def close(self):
+        if self.csv_file:
+            self.csv_file.close()
+
+    def draw_overlay(self, screen: pg.Surface):
+        if not self.enabled:
+            return
+
+        if self.overlay is None or not self.frame % OVERLAY_REFRESH:
+            self.overlay = self.render_overlay()
+
+        screen.blit(self.overlay, (0, 0))
+
+    def end_frame(self):
+        """Call once per frame, after the last stage"""
+        if not self.enabled:
+            return
+
+        self.current['frame'] = (perf_counter() - self.frame_start) * 1000
+
+        for name, ms in self.current.items():
+            if name == 'input':
+                continue  # <- Sampled per press by flipped
+            if name not in self.samples:
+                self.samples[name] = deque(maxlen=self.window)
+            self.samples[name].append(ms)
+
+        if self.csv_file:
+            columns = ['index'] + self.names
+            if not self.csv_writer or self.csv_writer.fieldnames != columns:
+                self.write_csv_header(columns)
+            self.csv_writer.writerow({'index': self.frame} | {
+                name: f'{ms:.3f}' for name, ms in self.current.items()})
+
+        self.current = {}
+        self.frame += 1
+
+    def flipped(self):
+        """Call right after display.flip"""
+        if not self.input_ticks:
+            return
+
+        now = pg.time.get_ticks()
+        latencies = [now - ticks for ticks in self.input_ticks]
+        self.samples.setdefault('input', deque(maxlen=self.window)).extend(
+            latencies)
+        self.current['input'] = max(latencies)
+        self.input_ticks = []
+
+    def input(self, ticks: int):
+        """A press, read at SDL tick count `ticks`, that the next flip shows"""
+        if self.enabled:
+            self.input_ticks.append(ticks)
+
+    def percentiles(self, name: str) -> tuple[float, float, float]:
+        samples = list(self.samples.get(name, [0]))
+        return tuple(percentile(samples, f) for f in [0.5, 0.95, 0.99])
+
+    def record(self, name: str, ms: float):
+        if name not in self.names:
+            self.names.append(name)
+
+        self.current[name] = self.current.get(name, 0) + ms
+
+    def render_overlay(self) -> pg.Surface:
+        if self.font is None:
+            pg.font.init()
+            self.font = pg.font.Font(None, 11)
+
+        names = sorted((n for n in self.samples if n != 'frame'),
+                       key=lambda n: self.percentiles(n)[1], reverse=True)
+        rows = ['frame'] + names[:OVERLAY_ROWS]
+
+        overlay = pg.Surface((148, 8 * (len(rows) + 1) + 2), pg.SRCALPHA)
+        overlay.fill((0, 0, 0, 180))
+
+        for n, name in enumerate(['ms'] + rows):
+            if n:
+                p50, p95, p99 = self.percentiles(name)
+                over = p95 > FRAME_BUDGET
+                columns = [f'{p:.1f}' for p in (p50, p95, p99)]
+            else:
+                over = False
+                columns = ['p50', 'p95', 'p99']
+
+            color = (255, 85, 85) if over else (248, 248, 242)
+            overlay.blit(self.font.render(name[:14], False, color), (2, n * 8))
+            for m, column in enumerate(columns):
+                text = self.font.render(column, False, color)
+                overlay.blit(text, (98 + 24 * m - text.get_width(), n * 8))
+
+        return overlay
+
+    def start_frame(self):
+        """Call once per frame, after waiting for the next frame's slot"""
+        self.frame_start = perf_counter()
+
+    def stage(self, name: str):
+        """Context manager timing one stage of the current frame"""
+        if not self.enabled:
+            return nullcontext()
+
+        return self.timed(name)
+
+    @contextmanager
+    def timed(self, name: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (perf_counter() - start) * 1000)
+
+    def wrap(self, module: ModuleType, prefix: str = 'draw'):
+        """Time every function in `module` named `prefix`*"""
+        if not self.enabled:
+            return
+
+        for name, function in list(vars(module).items()):
+            if name.startswith(prefix) and callable(function):
+                setattr(module, name, self.wrapped(name, function))
+
+    def write_csv_header(self, columns: list[str]):
+        """
+        Start the CSV, or rewrite it when a stage shows
+        up for the first time, padding earlier rows
+        """
+        self.csv_file.seek(0)
+        rows = list(csv.reader(self.csv_file))[1:]
+        self.csv_file.seek(0)
+        self.csv_file.truncate()
+
+        writer = csv.writer(self.csv_file)
+        writer.writerow(columns)
+        writer.writerows(row + [''] * (len(columns) - len(row))
+                         for row in rows)  # <- New stages are appended
+        self.csv_writer = csv.DictWriter(self.csv_file, columns, restval='')
+
+    def wrapped(self, name: str, function):
+        self.names.append(name)
+
+        @functools.wraps(function)
+        def timed_function(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(name, (perf_counter() - start) * 1000)
+
+        return timed_function
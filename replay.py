@@ -0,0 +1,208 @@
+"""
+Record the buttons that reach Game.handle_button_press
+and replay them without a display.
+
+A recording is a header (magic, version, first deal
+number), then one event per press: the fixed updates
+(Game.update calls) since the previous press as a
+varint and a button byte. A press that deals a new
+game is followed by a deal marker and the deal
+number, so games from a deal database replay
+without it. A clean exit adds an end marker, after
+the updates since the last press, and a hash of
+the final game state, which replays are checked
+against.
+
+    python replay.py recordings/*.klr
+"""
+import argparse
+import hashlib
+import struct
+import sys
+
+from pathlib import Path
+from random import Random
+from time import perf_counter
+
+from dealdb import Deal
+from logic import Game
+from rules import deal_order
+
+
+MAGIC   = b'KLRP'
+VERSION = 1
+HEADER  = struct.Struct('<4sBI')  # <- magic, version, first deal number
+END     = 0xff  # <- Button byte marking the final state hash
+DEAL    = 0xfe  # <- Button byte marking a new deal's number
+NUMBER  = struct.Struct('<I')  # <- After DEAL
+BUTTONS = ['A', 'B', 'X', 'Y', 'L2', 'R2', 'UP', 'DOWN', 'LEFT', 'RIGHT',
+           'START', 'SELECT', 'HOME']  # <- Append only, codes are stored
+
+
+def state_hash(game: Game) -> bytes:
+    """8-byte digest of everything a button press can change"""
+    digest = hashlib.blake2b(digest_size=8)
+    for pile in game.piles:
+        digest.update(bytes(card.id | card.is_face_up << 6 for card in pile))
+        digest.update(b'|')
+    digest.update(repr((
+        tuple(game.focus_coords), game.focus_stack_offset,
+        game.selected_stack_offset, game.selected_card, game.bank,
+        game.money, game.games, game.win, game.menu, game.menu_index,
+        game.game_over, game.seed
+    )).encode())
+
+    return digest.digest()
+
+
+def decode(data: bytes) -> tuple[int, list[int], list[tuple[int, str]], int,
+                                  bytes | None]:
+    """
+    First deal number, later deal numbers, (step,
+    button) events, total steps and final hash, if any
+    """
+    magic, version, seed = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'Not a version {VERSION} recording')
+
+    deals = []
+    events = []
+    step = 0
+    position = HEADER.size
+    try:
+        while position < len(data):
+            delta = shift = 0
+            while True:
+                byte = data[position]
+                position += 1
+                delta |= (byte & 0x7f) << shift
+                shift += 7
+                if not byte & 0x80:
+                    break
+
+            button = data[position]
+            position += 1
+            step += delta
+            if button == END:
+                return seed, deals, events, step, data[position:position + 8]
+            if button == DEAL:
+                deals.append(NUMBER.unpack_from(data, position)[0])
+                position += NUMBER.size
+                continue
+
+            events.append((step, BUTTONS[button]))
+    except (IndexError, struct.error):
+        pass  # <- Torn last event
+
+    # Recording was cut off, e.g. by a crash
+    return seed, deals, events, events[-1][0] if events else 0, None
+
+
+def encode_event(delta: int, button: int) -> bytes:
+    encoded = bytearray()
+    while delta >= 0x80:
+        encoded.append(delta & 0x7f | 0x80)
+        delta >>= 7
+    encoded.append(delta)
+    encoded.append(button)
+
+    return bytes(encoded)
+
+
+class RecordedDeals():
+    """
+    Stands in for a dealdb.DealDatabase, dealing the
+    numbers a recording saw in the order it saw them,
+    then random ones as a game without one would
+    """
+    def __init__(self, numbers: list[int]):
+        self.numbers = iter(numbers)
+
+    def get(self, number: int) -> Deal:
+        return Deal(number, bytes(deal_order(number)), 0, 0, 0)
+
+    def pick(self, winnable_only: bool = False,
+             rng: Random | None = None) -> Deal | None:
+        number = next(self.numbers, None)
+        return None if number is None else self.get(number)
+
+
+class Recorder():
+    """
+    Streams presses to `path` as they happen, so a
+    crash still leaves a replayable file
+    """
+    def __init__(self, path: Path, game: Game):
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, game.seed))
+        self.file.flush()
+        self.last_step = 0
+
+    def close(self, step: int, game: Game):
+        self.file.write(encode_event(step - self.last_step, END)
+                        + state_hash(game))
+        self.file.close()
+
+    def deal(self, seed: int):
+        """A new deal, made by the press just recorded"""
+        self.file.write(encode_event(0, DEAL) + NUMBER.pack(seed))
+        self.file.flush()
+
+    def record(self, step: int, button: str):
+        self.file.write(encode_event(step - self.last_step,
+                                     BUTTONS.index(button)))
+        self.file.flush()
+        self.last_step = step
+
+
+def replay(data: bytes) -> tuple[Game, bool | None]:
+    """
+    Play a recording back; the flag is whether the final
+    state matched, or None if the recording has no hash
+    """
+    seed, deals, events, last_step, expected = decode(data)
+    game = Game(seed, RecordedDeals(deals))
+    steps = 0
+    for at, button in events + [(last_step, None)]:
+        for _ in range(steps, at):
+            if button is not None and not game.autocomplete:
+                break  # <- The press skips whatever is still animating
+            settled = not game.is_animating()
+            game.update()
+            if settled:
+                break  # <- Only dropped finished tweens; nothing is left
+        steps = at
+
+        if button is not None:
+            game.handle_button_press(button)
+
+    if expected is None:
+        return game, None
+
+    return game, state_hash(game) == expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('paths', type=Path, nargs='+')
+    args = parser.parse_args()
+
+    recordings = [path.read_bytes() for path in args.paths]
+    failed = 0
+    start = perf_counter()
+    for path, data in zip(args.paths, recordings):
+        _, matched = replay(data)
+        if matched is False:
+            failed += 1
+            print(f'{path}: final state differs', file=sys.stderr)
+        elif matched is None:
+            print(f'{path}: no final state to check', file=sys.stderr)
+
+    elapsed = perf_counter() - start
+    print(f'{len(recordings)} replays, {failed} failed, '
+          f'{len(recordings) / elapsed:.0f}/s')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
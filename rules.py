@@ -0,0 +1,609 @@
+from array import array
+from bisect import insort
+from functools import lru_cache
+from random import Random
+from typing import Iterator
+
+
+SUITS = ['hearts', 'clubs', 'diamonds', 'spades']
+DEALS = 2 ** 32  # <- Deal numbers are 0 <= n < DEALS
+
+# Indices into Klondike.piles
+LIBRARY     = 0
+GRAVEYARD   = 1
+FOUNDATIONS = range(2, 6)
+TABLEAU     = range(6, 13)
+
+# Pile kinds (Pile.kind), by the first word of a pile's name
+LIBRARY_KIND    = 0
+GRAVEYARD_KIND  = 1
+FOUNDATION_KIND = 2
+TABLEAU_KIND    = 3
+KINDS = {'Library': LIBRARY_KIND, 'Graveyard': GRAVEYARD_KIND,
+         'Foundation': FOUNDATION_KIND, 'Tableau': TABLEAU_KIND}
+
+SCORING = ['vegas', 'cumulative']  # <- Cumulative carries the bank over
+PAYOUTS = [-52 + 5 * n for n in range(53)]  # <- Earnings by foundation cards
+
+# Move log entries pack (source, target, count, flipped, earnings change)
+# into one int: 4 + 4 + 4 + 1 bits, earnings signed in the rest
+FLIPPED     = 1 << 12
+MONEY_SHIFT = 13
+
+
+def deal_order(seed: int) -> list[int]:
+    """
+    Card ids in library order (last card dealt
+    first) for deal number `seed`
+    """
+    deck = Pile('Deck')
+    deck.set_cards(list(range(52)))
+    deck.shuffle(Random(seed))
+
+    return deck.cards
+
+
+@lru_cache
+def wants_tables(kings_only: bool) -> list[list[list[int]] | None]:
+    """
+    Per pile index, the card ids that pile takes by
+    its top card's id + 1 (0 when empty), or None if
+    it never takes cards. Shared, so never modified.
+    """
+    foundation = [[suit * 13 for suit in range(4)]]  # <- Aces
+    tableau = [[suit * 13 + 12 for suit in range(4)] if kings_only
+               else [i for i in range(52) if i % 13]]
+    for card_id in range(52):
+        rank = card_id % 13 + 1
+        foundation.append([card_id + 1] if rank < 13 else [])
+        tableau.append([suit * 13 + rank - 2 for suit in range(4)
+                        if suit % 2 != card_id // 13 % 2]
+                       if rank > 2 else [])  # <- No Aces on tableau piles
+
+    return [None, None] + [foundation] * len(FOUNDATIONS) \
+        + [tableau] * len(TABLEAU)
+
+
+class Card():
+    def __init__(self, suit: str, rank: int):
+        self.suit = suit
+        self.rank = rank
+        self.id = SUITS.index(suit) * 13 + rank - 1
+        self.color = 'red' if self.suit in ['hearts', 'diamonds'] else 'black'
+        self.is_face_up = False
+        self.display_rank = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10',
+                             'J', 'Q', 'K'][self.rank - 1]
+
+    def __repr__(self) -> str:
+        return f'{self.display_rank}{self.suit[0]}'
+
+    def flip(self):
+        self.is_face_up = not self.is_face_up
+
+    def reset(self):
+        self.is_face_up = False
+
+
+class Pile():
+    def __init__(self, name: str):
+        self.name = name
+        self.kind = KINDS.get(name.split(' ')[0])  # <- None for a loose deck
+        self.index = None  # <- Position in Klondike.piles
+        self.owner = None  # <- Klondike told about each place and pop
+        self.wants = []  # <- Card ids this pile would take, if a target
+        self.version = 0  # <- Bumped by every change to the cards, so
+                          #    use set_cards rather than assigning them
+
+        self.cards = []
+
+    def __bool__(self) -> bool:
+        return bool(self.cards)
+
+    def __getitem__(self, index: int) -> Card:
+        return self.cards[index]
+
+    def __iter__(self) -> Iterator:
+        return iter(self.cards)
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def __repr__(self) -> str:
+        return f'{self.name} ({len(self.cards)} cards): {self.cards}'
+
+    def draw(self) -> Card | None:
+        if self.cards:
+            return self.pop()
+        else:
+            return None
+
+    def get_card_with_offset(self, offset: int) -> Card|None:
+        try:
+            return self.cards[len(self.cards) - 1 + offset]
+        except IndexError:
+            return None
+
+    def get_type(self) -> int | None:
+        return self.kind
+
+    def get_top_card(self) -> Card|None:
+        try:
+            return self.cards[-1]
+        except IndexError:
+            return None
+
+    def place(self, card: Card):
+        self.cards.append(card)
+        self.version += 1
+        if self.owner is not None:
+            self.owner.placed(self, card)
+
+    def pop(self, index: int = -1) -> Card:
+        card = self.cards.pop(index)
+        self.version += 1
+        if self.owner is not None:
+            self.owner.removed(self, card)
+
+        return card
+
+    def set_cards(self, cards: list[Card]):
+        if self.owner is not None:
+            for card in self.cards[::-1]:
+                self.owner.removed(self, card)
+            for card in cards:
+                self.owner.placed(self, card)
+
+        self.cards = cards
+        self.version += 1
+
+    def shuffle(self, rng: Random):
+        self.set_cards(rng.sample(self.cards, k=len(self.cards)))
+
+
+class Rules():
+    """
+    One variant of the rules, fixed for a session:
+    cards turned per draw, passes through the
+    library (None for no limit), how the bank is
+    scored and whether only Kings go on empty
+    columns. Klondike compiles it into lookup tables
+    when the game starts.
+    """
+    def __init__(self, draw: int = 1, passes: int | None = 1,
+                 scoring: str = 'cumulative', kings_only: bool = True):
+        if not 0 < draw < 16:  # <- Has to fit a move log count
+            raise ValueError(f'Can\'t draw {draw} cards at a time')
+        if passes is not None and passes < 1:
+            raise ValueError(f'Need at least one pass, not {passes}')
+        if scoring not in SCORING:
+            raise ValueError(f'Scoring is one of {SCORING}, not {scoring!r}')
+
+        self.draw = draw
+        self.passes = passes
+        self.scoring = scoring
+        self.kings_only = kings_only
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Rules) and vars(self) == vars(other)
+
+    def __repr__(self) -> str:
+        return f'Rules(draw={self.draw}, passes={self.passes}, ' \
+               f'scoring={self.scoring!r}, kings_only={self.kings_only})'
+
+    @property
+    def classic(self) -> bool:
+        """Whether moves follow the rules the solver searches"""
+        return self.draw == 1 and self.passes == 1 and self.kings_only
+
+
+class Klondike():
+    """
+    Vegas Klondike rules with no display or
+    input state. Moves are (source, depth,
+    target) triples of indices into `piles`,
+    where depth is the number of cards moved.
+    A draw is always (LIBRARY, 1, GRAVEYARD),
+    however many cards it turns.
+    """
+    card_class = Card
+    pile_class = Pile
+
+    def __init__(self, seed: int | None = None, deals=None,
+                 winnable_only: bool = False, rules: Rules | None = None):
+        self.deals = deals  # <- Optional dealdb.DealDatabase
+        self.winnable_only = winnable_only
+        self.rules = rules or Rules()
+        self.seed = None
+        self.bank = 100
+        self.face_down_cards = 0
+        self.foundation_cards = 0  # <- Kept up by placed and removed
+        self.foundation_heights = [0] * 4  # <- Per suit
+        self.game_earnings = 0
+        self.games = 0
+        self.history = array('i')  # <- Packed move log, see log_move
+        self.money = 0
+        self.piles = []
+        self.recycles = 0  # <- Passes through the library after the first
+        self.redo_log = array('i')
+        self.wanted = {}  # <- Card id -> indices of piles that would take it
+        self.win = False
+
+        self.rng = Random()
+        if seed is None:
+            seed = self.pick_deal(None)[0]
+        self.rng.seed(seed)  # <- The first deal number replays the session
+
+        self.compile_rules()
+        self.new(seed)
+
+    @property
+    def board_empty(self) -> bool:
+        """Whether every card is on the foundations"""
+        return self.foundation_cards == 52
+
+    def can_draw(self) -> bool:
+        """Whether there are cards to turn, or passes left to recycle"""
+        return bool(self.library) or (bool(self.graveyard)
+                                      and self.recycles < self.max_recycles)
+
+    def can_move(self, source: int, depth: int, target: int) -> bool:
+        if source == LIBRARY:
+            return target == GRAVEYARD and depth == 1 and self.can_draw()
+        if source == target or not 0 < depth <= len(self.piles[source]):
+            return False
+
+        if source in TABLEAU:
+            if not self.piles[source].get_card_with_offset(
+                1 - depth).is_face_up:
+                return False
+        elif depth > 1:
+            return False  # <- Only tableau piles can be split into stacks
+
+        return self.is_legal_move(
+            self.piles[source].get_card_with_offset(1 - depth),
+            self.piles[target], depth)
+
+    def autocomplete_moves(self) -> list[tuple[int, int, int]]:
+        """
+        Moves that take the cards left to the foundations
+        once nothing is face down. A foundation move comes
+        first, else the graveyard's top card onto a column
+        that takes it, else a draw or recycle. The moves
+        are played to find them, then taken back.
+        """
+        moves = []
+        stalled = False  # <- Nothing played since the last recycle
+        while not self.board_empty:
+            for source in [GRAVEYARD, *TABLEAU]:
+                card = self.piles[source].get_top_card()
+                foundation = card and self.foundation_for(card)
+                if foundation is not None:
+                    moves.append((source, 1, foundation.index))
+                    break
+            else:
+                if self.graveyard and self.wanted.get(self.graveyard[-1].id):
+                    moves.append((GRAVEYARD, 1,
+                                  self.wanted[self.graveyard[-1].id][0]))
+                elif self.library or (not stalled and self.can_draw()):
+                    moves.append((LIBRARY, 1, GRAVEYARD))
+                else:
+                    break  # <- Stuck
+
+            source, depth, target = moves[-1]
+            if source == LIBRARY:
+                stalled = stalled or not self.library
+                Klondike.draw(self)  # <- Not a subclass override
+            else:
+                stalled = False
+                self.transfer(self.piles[source], depth, self.piles[target])
+
+        pending, self.redo_log = self.redo_log, array('i')
+        for _ in moves:
+            self.undo()
+        self.redo_log = pending
+
+        return moves
+
+    def check_win(self) -> bool:
+        self.update_money()
+
+        if self.face_down_cards == 0:
+            self.win = True
+
+        return self.win
+
+    def collect(self):
+        for pile in self.piles[1:]:  # <- Don't collect from library
+            while pile.cards:
+                card = pile.pop()
+                card.reset()
+                self.library.place(card)
+
+    def compile_rules(self):
+        """
+        Turn `rules` into the tables moves look things
+        up in, so every variant plays at the same speed
+        """
+        rules = self.rules
+        self.draw_count = rules.draw
+        self.max_recycles = float('inf') if rules.passes is None \
+            else rules.passes - 1
+        self.carry_bank = rules.scoring == 'cumulative'
+        self.payouts = PAYOUTS
+        self.wants_tables = wants_tables(rules.kings_only)
+
+    def deal(self):
+        for i in range(7):
+            for j in range(i, 7):
+                self.tableau[j].place(self.library.draw())
+                self.face_down_cards += 1
+
+        for pile in self.tableau:
+            pile.get_top_card().flip()
+            self.face_down_cards -= 1
+
+        for n in [*FOUNDATIONS, *TABLEAU]:
+            self.update_wanted(self.piles[n])
+
+        self.update_money()
+        self.games += 1
+        self.recycles = 0
+        del self.history[:]
+        del self.redo_log[:]
+
+    def draw(self) -> bool:
+        """
+        Turn the next `rules.draw` cards onto the
+        graveyard, or recycle it once the library is out
+        """
+        if not self.library:
+            return self.recycle_library()
+
+        count = min(self.draw_count, len(self.library))
+        for _ in range(count):
+            self.graveyard.place(self.library.draw())
+            self.graveyard.get_top_card().flip()
+        self.log_move(LIBRARY, GRAVEYARD, count, 0)
+        return True
+
+    def foundation_for(self, card: Card) -> Pile | None:
+        """First foundation that would take `card`"""
+        for n in self.wanted.get(card.id, []):
+            if n in FOUNDATIONS:
+                return self.piles[n]
+
+        return None
+
+    def init_library(self):
+        for suit in SUITS:
+            for rank in range(1, 14):
+                self.library.place(self.card_class(suit, rank))
+
+    def is_legal_move(self, card: Card, target: Pile, depth: int = 1) -> bool:
+        if depth > 1 and target.kind == FOUNDATION_KIND:
+            return False  # <- Can't move multiple cards to a foundation!
+
+        return target.index in self.wanted.get(card.id, [])
+
+    def legal_moves(self) -> list[tuple[int, int, int]]:
+        moves = []
+        if self.can_draw():
+            moves.append((LIBRARY, 1, GRAVEYARD))
+
+        for source in [GRAVEYARD, *FOUNDATIONS, *TABLEAU]:
+            pile = self.piles[source]
+            for depth in range(1, len(pile) + 1):
+                card = pile.cards[-depth]
+                if not card.is_face_up or (depth > 1 and source < TABLEAU[0]):
+                    break
+
+                for target in self.wanted.get(card.id, []):
+                    if depth == 1 or target in TABLEAU:
+                        moves.append((source, depth, target))
+
+        return moves
+
+    def log_move(self, source: int, target: int, count: int, earned: int):
+        """A new move makes the undone ones unreachable"""
+        self.history.append(source | target << 4 | count << 8
+                            | earned << MONEY_SHIFT)
+        del self.redo_log[:]
+
+    def move(self, source: int, depth: int, target: int) -> bool:
+        if not self.can_move(source, depth, target):
+            return False
+
+        if source == LIBRARY:
+            return self.draw()
+
+        self.transfer(self.piles[source], depth, self.piles[target])
+        if source in TABLEAU:
+            self.reveal(self.piles[source])
+
+        return True
+
+    def new(self, seed: int | None = None):
+        self.library     = self.pile_class('Library')
+        self.graveyard   = self.pile_class('Graveyard')
+        self.tableau     = [self.pile_class(f'Tableau {n}') for n in range(7)]
+        self.foundations = [self.pile_class(f'Foundation {n}')
+                            for n in range(4)]
+        self.piles = [self.library, self.graveyard] + self.foundations \
+                    + self.tableau
+        for n, pile in enumerate(self.piles):
+            pile.index = n
+        for pile in self.foundations:
+            pile.owner = self
+        self.foundation_cards = 0
+        self.foundation_heights = [0] * 4
+        self.wanted = {}
+
+        self.init_library()
+        self.shuffle(*self.pick_deal(seed))
+        self.deal()
+
+    def next_game(self, seed: int | None = None):
+        if self.carry_bank:
+            self.bank += self.game_earnings
+        self.game_earnings = 0
+        self.win = False
+        self.face_down_cards = 0
+
+        self.collect()
+        self.shuffle(*self.pick_deal(seed))
+        self.deal()
+
+    def pick_deal(self, seed: int | None) -> tuple[int, bytes | None]:
+        """
+        Deal number and, when it comes from the deal
+        database, its stored card order
+        """
+        if self.deals is not None:
+            if seed is None:
+                deal = self.deals.pick(self.winnable_only, self.rng)
+            else:
+                deal = self.deals.get(seed)
+            if deal is not None:
+                return deal.number, deal.order
+
+        if seed is None:
+            seed = self.rng.randrange(DEALS)
+
+        return seed, None
+
+    def placed(self, pile: Pile, card: Card):
+        """Called by the foundations as a card goes on"""
+        self.foundation_cards += 1
+        self.foundation_heights[card.id // 13] = card.rank
+
+    def redo(self) -> bool:
+        if not self.redo_log:
+            return False
+
+        entry = self.redo_log.pop()
+        pending, self.redo_log = self.redo_log, array('i')  # <- Survives the
+                                                            #    log_move below
+        source, target, count = entry & 15, entry >> 4 & 15, entry >> 8 & 15
+        if LIBRARY in [source, target]:  # <- A draw or a recycle
+            Klondike.draw(self)  # <- Not a subclass override
+        else:
+            self.transfer(self.piles[source], count, self.piles[target])
+            if entry & FLIPPED:
+                self.reveal(self.piles[source])
+
+        self.redo_log = pending
+        return True
+
+    def recycle_library(self) -> bool:
+        """Turn the graveyard back over, if a pass is left"""
+        if not self.graveyard or self.recycles >= self.max_recycles:
+            return False
+
+        while self.graveyard:
+            card = self.graveyard.pop()
+            card.reset()
+            self.library.place(card)
+        self.recycles += 1
+        self.log_move(GRAVEYARD, LIBRARY, 0, 0)  # <- Undone as a whole pile
+        return True
+
+    def removed(self, pile: Pile, card: Card):
+        """Called by the foundations as a card comes off"""
+        self.foundation_cards -= 1
+        self.foundation_heights[card.id // 13] = card.rank - 1
+
+    def reveal(self, pile: Pile):
+        revealed_card = pile.get_top_card()
+        if revealed_card:
+            if not revealed_card.is_face_up:
+                revealed_card.flip()
+                self.face_down_cards -= 1
+                if self.history:
+                    self.history[-1] |= FLIPPED  # <- Always follows a transfer
+
+                self.check_win()
+
+    def shuffle(self, seed: int, order: bytes | list[int] | None = None):
+        """Put the library in the order of deal number `seed`"""
+        if order is None:
+            order = deal_order(seed)
+
+        by_id = sorted(self.library.cards, key=lambda card: card.id)
+        self.library.set_cards([by_id[n] for n in order])
+        self.seed = seed
+
+    def start_over(self):
+        self.bank = 100
+        self.games = 0
+        self.game_earnings = 0
+        self.next_game()
+
+    def transfer(self, source: Pile, depth: int, target: Pile):
+        for n in range(depth, 0, -1):
+            target.place(source.pop(-n))
+
+        earnings = self.game_earnings
+        self.update_wanted(source)
+        self.update_wanted(target)
+        self.update_money()
+        self.log_move(source.index, target.index, depth,
+                      self.game_earnings - earnings)
+
+    def undo(self) -> bool:
+        """
+        Take back the last move, reveal and draw
+        included, without touching any other pile
+        """
+        if not self.history:
+            return False
+
+        entry = self.history.pop()
+        self.redo_log.append(entry)
+        source = self.piles[entry & 15]
+        target = self.piles[entry >> 4 & 15]
+        count = entry >> 8 & 15
+
+        if source.index == LIBRARY:
+            for _ in range(count):
+                card = target.pop()
+                card.flip()
+                source.place(card)
+            return True
+        if target.index == LIBRARY:  # <- A recycle
+            while target:
+                card = target.pop()
+                card.flip()
+                source.place(card)
+            self.recycles -= 1
+            return True
+
+        if entry & FLIPPED:
+            source.get_top_card().flip()
+            self.face_down_cards += 1
+            self.win = False
+
+        for n in range(count, 0, -1):
+            source.place(target.pop(-n))
+
+        self.update_wanted(source)
+        self.update_wanted(target)
+        self.game_earnings -= entry >> MONEY_SHIFT
+        self.money = self.bank + self.game_earnings
+        return True
+
+    def update_wanted(self, pile: Pile):
+        """Re-index the cards `pile` takes after its top card changed"""
+        table = self.wants_tables[pile.index]
+        if table is None:
+            return  # <- Library and graveyard aren't targets
+
+        for card_id in pile.wants:
+            self.wanted[card_id].remove(pile.index)
+
+        pile.wants = table[pile.cards[-1].id + 1 if pile.cards else 0]
+        for card_id in pile.wants:
+            insort(self.wanted.setdefault(card_id, []), pile.index)
+
+    def update_money(self):
+        self.game_earnings = self.payouts[self.foundation_cards]
+        self.money = self.bank + self.game_earnings
@@ -0,0 +1,412 @@
+from random import Random
+from time import perf_counter
+from typing import Iterator
+
+from rules import FOUNDATIONS, GRAVEYARD, LIBRARY, TABLEAU, Klondike
+
+
+MAX_ROWS = 20  # <- 6 face-down cards + a full King-to-Ace run, rounded up
+WASTE    = 7 * MAX_ROWS  # <- Location index for cards in the graveyard
+
+# Zobrist keys: one per (card, location), per (column, face-down count),
+# per (suit, foundation height) and per library position
+_rng = Random(0x6b6c6f6e)
+Z_CARD = [[_rng.getrandbits(64) for _ in range(WASTE + 1)] for _ in range(52)]
+Z_HIDDEN = [[_rng.getrandbits(64) for _ in range(7)] for _ in range(7)]
+Z_FOUNDATION = [[_rng.getrandbits(64) for _ in range(14)] for _ in range(4)]
+Z_STOCK = [_rng.getrandbits(64) for _ in range(53)]
+
+
+class SolveResult():
+    def __init__(self, winnable: bool|None, moves: list[tuple[int, int, int]],
+                 nodes: int, elapsed: float, table_entries: int):
+        self.winnable = winnable  # <- None if a limit was hit first
+        self.moves = moves
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.table_entries = table_entries
+
+    def __repr__(self) -> str:
+        return f'SolveResult(winnable={self.winnable}, ' \
+               f'moves={len(self.moves)}, nodes={self.nodes}, ' \
+               f'elapsed={self.elapsed:.3f})'
+
+
+class TranspositionTable():
+    """
+    Set of visited state hashes holding at most
+    `max_entries` keys. When the newest generation
+    fills up, the older one is dropped wholesale,
+    which evicts the states least recently added.
+    """
+    def __init__(self, max_entries: int):
+        self.generation_size = max(1, max_entries // 2)
+        self.current = set()
+        self.previous = set()
+        self.peak = 0
+
+    def __contains__(self, key: int) -> bool:
+        return key in self.current or key in self.previous
+
+    def __len__(self) -> int:
+        return len(self.current) + len(self.previous)
+
+    def add(self, key: int):
+        if len(self.current) >= self.generation_size:
+            self.previous = self.current
+            self.current = set()
+
+        self.current.add(key)
+        self.peak = max(self.peak, len(self))
+
+
+class Solver():
+    """
+    Depth-first search over a compact copy of a
+    Klondike position. Cards are ints (suit * 13 +
+    rank - 1) and moves use the same (source, depth,
+    target) pile indices as `Klondike.move`. Only
+    the classic rules are modelled (Rules.classic).
+    """
+    def __init__(self, game: Klondike, table_size: int = 1_000_000):
+        self.columns = [[c.id for c in pile]
+                        for pile in game.tableau]
+        self.hidden = [len([c for c in pile if not c.is_face_up])
+                       for pile in game.tableau]
+        self.waste = [c.id for c in game.graveyard]
+        self.stock = [c.id for c in game.library][::-1]
+        self.stock_pos = 0
+
+        self.foundations = list(game.foundation_heights)  # <- Per suit
+        self.foundation_piles = [-1] * 4  # <- Pile index per suit
+        for n, pile in zip(FOUNDATIONS, game.foundations):
+            if pile:
+                self.foundation_piles[pile[0].id // 13] = n
+
+        self.path = []  # <- Records of the line being searched
+        self.table = TranspositionTable(table_size)
+        self.hash = self.compute_hash()
+
+    def apply(self, move: tuple[int, int, int]) -> tuple:
+        """Play `move` and return a record for `undo`"""
+        source, depth, target = move
+        revealed = False
+        claimed = False
+
+        if source == LIBRARY:
+            card = self.stock[self.stock_pos]
+            self.hash ^= Z_STOCK[self.stock_pos] ^ \
+                Z_STOCK[self.stock_pos + 1] ^ Z_CARD[card][WASTE]
+            self.stock_pos += 1
+            self.waste.append(card)
+            return (move, revealed, claimed)
+
+        if source == GRAVEYARD:
+            cards = [self.waste.pop()]
+            self.hash ^= Z_CARD[cards[0]][WASTE]
+        elif source in TABLEAU:
+            col = source - TABLEAU[0]
+            column = self.columns[col]
+            cards = column[-depth:]
+            del column[-depth:]
+            for row, card in enumerate(cards, len(column)):
+                self.hash ^= Z_CARD[card][col * MAX_ROWS + row]
+
+            if column and self.hidden[col] == len(column):
+                self.hash ^= Z_HIDDEN[col][self.hidden[col]] ^ \
+                    Z_HIDDEN[col][self.hidden[col] - 1]
+                self.hidden[col] -= 1
+                revealed = True
+        else:
+            suit = self.foundation_piles.index(source)
+            height = self.foundations[suit]
+            cards = [suit * 13 + height - 1]
+            self.hash ^= Z_FOUNDATION[suit][height] ^ \
+                Z_FOUNDATION[suit][height - 1]
+            self.foundations[suit] -= 1
+
+        if target in TABLEAU:
+            col = target - TABLEAU[0]
+            column = self.columns[col]
+            for row, card in enumerate(cards, len(column)):
+                self.hash ^= Z_CARD[card][col * MAX_ROWS + row]
+            column.extend(cards)
+        else:
+            suit = cards[0] // 13
+            if self.foundation_piles[suit] < 0:
+                self.foundation_piles[suit] = target
+                claimed = True
+
+            height = self.foundations[suit]
+            self.hash ^= Z_FOUNDATION[suit][height] ^ \
+                Z_FOUNDATION[suit][height + 1]
+            self.foundations[suit] += 1
+
+        return (move, revealed, claimed)
+
+    def compute_hash(self) -> int:
+        key = Z_STOCK[self.stock_pos]
+        for col, column in enumerate(self.columns):
+            key ^= Z_HIDDEN[col][self.hidden[col]]
+            for row, card in enumerate(column):
+                key ^= Z_CARD[card][col * MAX_ROWS + row]
+        for card in self.waste:
+            key ^= Z_CARD[card][WASTE]
+        for suit, height in enumerate(self.foundations):
+            key ^= Z_FOUNDATION[suit][height]
+
+        return key
+
+    def foundation_target(self, card: int) -> int | None:
+        suit, rank = divmod(card, 13)
+        if self.foundations[suit] != rank:
+            return None
+        if self.foundation_piles[suit] >= 0:
+            return self.foundation_piles[suit]
+
+        for n in FOUNDATIONS:  # <- Aces claim the first free foundation
+            if n not in self.foundation_piles:
+                return n
+
+    def is_safe(self, card: int) -> bool:
+        """
+        A foundation move is safe once nothing still
+        in play could need this card as a base
+        """
+        suit, rank = divmod(card, 13)
+        rank += 1
+        if rank <= 2:
+            return True
+
+        opposite = [s for s in range(4) if s % 2 != suit % 2]
+        return all(self.foundations[s] >= rank - 1 for s in opposite)
+
+    def is_won(self) -> bool:
+        return not any(self.hidden)
+
+    def ordered_moves(self) -> list[tuple[int, int, int]]:
+        """
+        Foundation moves first, then moves that reveal
+        face-down cards, then everything else. A safe
+        foundation move is returned on its own.
+        """
+        to_foundation = []
+        revealing = []
+        others = []
+
+        tops = [(GRAVEYARD, self.waste[-1])] if self.waste else []
+        tops += [(TABLEAU[col], column[-1])
+                 for col, column in enumerate(self.columns) if column]
+        for source, card in tops:
+            target = self.foundation_target(card)
+            if target is not None:
+                if self.is_safe(card):
+                    return [(source, 1, target)]
+                to_foundation.append((source, 1, target))
+
+        accepts = self.tableau_targets()
+
+        for col, column in enumerate(self.columns):
+            face_up = len(column) - self.hidden[col]
+            for depth in range(1, face_up + 1):
+                card = column[-depth]
+                if card not in accepts:
+                    continue
+
+                if depth == face_up and self.hidden[col]:
+                    bucket = revealing
+                elif depth == face_up and card % 13 != 12:
+                    bucket = others  # <- Empties a column for a King
+                elif depth < face_up and \
+                    self.foundation_target(column[-depth - 1]) is not None:
+                    bucket = others  # <- Frees a card for the foundations
+                else:
+                    continue
+
+                for target in accepts[card]:
+                    bucket.append((TABLEAU[col], depth, target))
+
+        if self.waste:
+            for target in accepts.get(self.waste[-1], []):
+                others.append((GRAVEYARD, 1, target))
+
+        playable = None
+        for suit, height in enumerate(self.foundations):
+            card = suit * 13 + height - 1
+            if height > 1 and card in accepts:
+                if playable is None:
+                    playable = self.playable_cards()
+                if any(c in playable for c in self.children(card)):
+                    for target in accepts[card]:
+                        others.append((self.foundation_piles[suit], 1, target))
+
+        if self.stock_pos < len(self.stock):
+            others.append((LIBRARY, 1, GRAVEYARD))
+
+        return to_foundation + revealing + others
+
+    def children(self, card: int) -> list[int]:
+        """Cards that can be stacked on `card` in the tableau"""
+        suit, rank = divmod(card, 13)
+        if rank < 2:
+            return []  # <- Nothing goes on an Ace, and Aces go on nothing
+
+        return [s * 13 + rank - 1 for s in range(4) if s % 2 != suit % 2]
+
+    def playable_cards(self) -> set[int]:
+        cards = {self.waste[-1]} if self.waste else set()
+        for col, column in enumerate(self.columns):
+            cards.update(column[self.hidden[col]:])
+
+        return cards
+
+    def tableau_targets(self) -> dict[int, list[int]]:
+        """Map each card to the tableau piles that would accept it"""
+        accepts = {}
+        empty_column = None
+        for col, column in enumerate(self.columns):
+            if column:
+                for card in self.children(column[-1]):
+                    accepts.setdefault(card, []).append(TABLEAU[col])
+            elif empty_column is None:
+                empty_column = TABLEAU[col]
+
+        if empty_column is not None:
+            for suit in range(4):
+                accepts[suit * 13 + 12] = [empty_column]
+
+        return accepts
+
+    def search(self, max_nodes: int = 2_000_000,
+               max_time: float | None = None,
+               slice_nodes: int | None = None) -> Iterator[SolveResult|None]:
+        """
+        `solve` as a generator: yields None every
+        `slice_nodes` nodes, with the current line in
+        `path`, and the SolveResult last
+        """
+        start = perf_counter()
+        nodes = 0
+        path = self.path = []
+
+        if self.is_won():
+            yield SolveResult(True, [], 0, 0.0, 0)
+            return
+
+        self.table.add(self.hash)
+        frames = [[self.ordered_moves(), 0]]
+
+        while frames:
+            if nodes >= max_nodes or (max_time is not None and
+                                      not nodes & 0x3ff and
+                                      perf_counter() - start > max_time):
+                self.unwind(path)
+                yield SolveResult(None, [], nodes,
+                                  perf_counter() - start, self.table.peak)
+                return
+
+            frame = frames[-1]
+            moves, index = frame
+            if index >= len(moves):
+                frames.pop()
+                if path:
+                    self.undo(path.pop())
+                continue
+
+            frame[1] += 1
+            record = self.apply(moves[index])
+            nodes += 1
+
+            if self.is_won():
+                path.append(record)
+                solution = [r[0] for r in path]
+                self.unwind(path)
+                yield SolveResult(True, solution, nodes,
+                                  perf_counter() - start, self.table.peak)
+                return
+
+            if self.hash in self.table:
+                self.undo(record)
+                continue
+
+            self.table.add(self.hash)
+            path.append(record)
+            frames.append([self.ordered_moves(), 0])
+
+            if slice_nodes and not nodes % slice_nodes:
+                yield None
+
+        yield SolveResult(False, [], nodes, perf_counter() - start,
+                          self.table.peak)
+
+    def solve(self, max_nodes: int = 2_000_000,
+              max_time: float | None = None) -> SolveResult:
+        for result in self.search(max_nodes, max_time):
+            pass
+
+        return result
+
+    def undo(self, record: tuple):
+        (source, depth, target), revealed, claimed = record
+
+        if source == LIBRARY:
+            card = self.waste.pop()
+            self.stock_pos -= 1
+            self.hash ^= Z_STOCK[self.stock_pos] ^ \
+                Z_STOCK[self.stock_pos + 1] ^ Z_CARD[card][WASTE]
+            return
+
+        if target in TABLEAU:
+            col = target - TABLEAU[0]
+            column = self.columns[col]
+            cards = column[-depth:]
+            del column[-depth:]
+            for row, card in enumerate(cards, len(column)):
+                self.hash ^= Z_CARD[card][col * MAX_ROWS + row]
+        else:
+            suit = self.foundation_piles.index(target)
+            height = self.foundations[suit]
+            cards = [suit * 13 + height - 1]
+            self.hash ^= Z_FOUNDATION[suit][height] ^ \
+                Z_FOUNDATION[suit][height - 1]
+            self.foundations[suit] -= 1
+            if claimed:
+                self.foundation_piles[suit] = -1
+
+        if source == GRAVEYARD:
+            self.waste.append(cards[0])
+            self.hash ^= Z_CARD[cards[0]][WASTE]
+        elif source in TABLEAU:
+            col = source - TABLEAU[0]
+            column = self.columns[col]
+            if revealed:
+                self.hash ^= Z_HIDDEN[col][self.hidden[col]] ^ \
+                    Z_HIDDEN[col][self.hidden[col] + 1]
+                self.hidden[col] += 1
+            for row, card in enumerate(cards, len(column)):
+                self.hash ^= Z_CARD[card][col * MAX_ROWS + row]
+            column.extend(cards)
+        else:
+            suit = cards[0] // 13
+            height = self.foundations[suit]
+            self.hash ^= Z_FOUNDATION[suit][height] ^ \
+                Z_FOUNDATION[suit][height + 1]
+            self.foundations[suit] += 1
+
+    def unwind(self, path: list[tuple]):
+        while path:
+            self.undo(path.pop())
+
+
+def solve(game: Klondike, max_nodes: int = 2_000_000,
+          max_time: float | None = None,
+          table_size: int = 1_000_000) -> SolveResult:
+    """
+    Can `game` still be won (every tableau card face
+    up)? Unknown under rules other than the classic
+    ones the search models.
+    """
+    if not game.rules.classic:
+        return SolveResult(None, [], 0, 0.0, 0)
+
+    return Solver(game, table_size).solve(max_nodes, max_time)
@@ -0,0 +1,114 @@
+"""
+Saved results and high scores. Each finished game
+appends one line to a log; every so often the new
+lines are folded into a small JSON summary, which
+is all startup has to read (plus any lines written
+since). Both files only ever change atomically.
+Each scoring mode keeps its own pair, so a Vegas
+session never touches the cumulative run.
+"""
+import json
+import os
+
+from pathlib import Path
+
+from rules import Klondike
+
+
+COMPACT_EVERY = 20  # <- Log lines between summary rewrites
+SUMMARY = {
+    'version': 1,
+    'log_offset': 0,  # <- Bytes of the log already folded in
+    'games_played': 0,  # <- Across every run
+    'wins': 0,
+    'best_bank': 100,
+    'most_games': 0,  # <- Longest run before starting over
+    'bank': 100,  # <- Where the current run stands
+    'games': 0,
+}
+
+
+def write_atomic(path: Path, data: bytes):
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+    tmp.replace(path)
+
+
+class Stats():
+    def __init__(self, directory: Path, scoring: str = 'cumulative'):
+        directory.mkdir(parents=True, exist_ok=True)
+        suffix = '' if scoring == 'cumulative' else f'-{scoring}'
+        self.log_path = directory / f'results{suffix}.log'
+        self.summary_path = directory / f'summary{suffix}.json'
+
+        self.summary = dict(SUMMARY)
+        if self.summary_path.exists():
+            self.summary.update(json.loads(self.summary_path.read_text()))
+
+        self.pending = 0  # <- Lines not yet in the summary file
+        for line in self.read_tail():
+            self.fold(line)
+            self.pending += 1
+
+        self.log = open(self.log_path, 'ab')
+
+    def close(self):
+        self.compact()
+        self.log.close()
+
+    def compact(self):
+        if not self.pending:
+            return
+
+        self.summary['log_offset'] = self.log.tell()
+        write_atomic(self.summary_path,
+                     json.dumps(self.summary, indent=2).encode() + b'\n')
+        self.pending = 0
+
+    def fold(self, line: bytes):
+        seed, won, cards, earnings, bank, games = map(int, line.split())
+        summary = self.summary
+        summary['games_played'] += 1
+        summary['wins'] += won
+        summary['best_bank'] = max(summary['best_bank'], bank)
+        summary['most_games'] = max(summary['most_games'], games)
+        summary['bank'] = bank
+        summary['games'] = games
+
+    def read_tail(self) -> list[bytes]:
+        """Log lines written since the last compaction, dropping a torn one"""
+        if not self.log_path.exists():
+            return []
+
+        with open(self.log_path, 'rb+') as f:
+            f.seek(self.summary['log_offset'])
+            data = f.read()
+            complete = data.rfind(b'\n') + 1
+            if complete < len(data):
+                f.truncate(self.summary['log_offset'] + complete)
+
+        return data[:complete].splitlines()
+
+    def record(self, game: Klondike):
+        """Log the game that's just ending"""
+        line = (f'{game.seed} {int(game.win)} {game.foundation_cards} '
+                f'{game.game_earnings} {game.bank + game.game_earnings} '
+                f'{game.games}\n').encode()
+        self.log.write(line)
+        self.log.flush()
+        self.fold(line)
+
+        self.pending += 1
+        if self.pending >= COMPACT_EVERY:
+            self.compact()
+
+    def restore(self, game: Klondike):
+        """Carry the saved run on into `game`'s first deal"""
+        if game.carry_bank:  # <- Vegas starts every deal from G100
+            game.bank = self.summary['bank']
+        game.games += self.summary['games']
+        game.update_money()
@@ -0,0 +1,205 @@
+"""
+Play whole Vegas sessions with several policies
+and compare what the bank does:
+
+    python tournament.py --sessions 10000 --games 100
+
+A session starts with G100 and deals game after
+game (G52 in, G5 per foundation card) until it has
+played --games or can't afford the next buy-in.
+Every game's earnings land in one NumPy array per
+policy, from which the report takes expected value
+per game, win rate, risk of ruin and the spread of
+final banks. Needs NumPy.
+"""
+import argparse
+
+from multiprocessing import Pool
+from random import Random
+from time import perf_counter
+
+import numpy as np
+
+from rules import FOUNDATIONS, GRAVEYARD, LIBRARY, TABLEAU, Klondike
+from solver import solve
+
+
+MAX_MOVES    = 300  # <- Per game, so a random policy can't shuffle forever
+SOLVER_NODES = 20_000  # <- Search per deal for the solver policy
+CHECKPOINTS  = [10, 25, 50, 100]  # <- Games at which risk of ruin is shown
+
+
+def greedy(game: Klondike, rng: Random) -> tuple[int, int, int] | None:
+    """
+    Foundation moves first, then moves that reveal
+    a card, then graveyard plays, then draws. Only
+    looks at the few cards that could move, rather
+    than listing every legal move.
+    """
+    piles = game.piles
+    wanted = game.wanted
+    for source in [GRAVEYARD, *TABLEAU]:
+        cards = piles[source].cards
+        if cards:
+            for target in wanted.get(cards[-1].id, []):
+                if target in FOUNDATIONS:
+                    return source, 1, target
+
+    for source in TABLEAU:
+        cards = piles[source].cards
+        depth = 1
+        while depth < len(cards) and cards[-depth - 1].is_face_up:
+            depth += 1
+        if depth < len(cards):  # <- A face down card under the run
+            for target in wanted.get(cards[-depth].id, []):
+                if target in TABLEAU:
+                    return source, depth, target
+
+    cards = game.graveyard.cards
+    targets = wanted.get(cards[-1].id) if cards else None
+    if targets:
+        return GRAVEYARD, 1, targets[0]
+
+    if game.can_draw():
+        return LIBRARY, 1, GRAVEYARD
+
+    return None  # <- Shuffling cards between columns gains nothing
+
+
+def random_move(game: Klondike, rng: Random) -> tuple[int, int, int] | None:
+    """Any legal move that doesn't take a card back off a foundation"""
+    moves = [move for move in game.legal_moves()
+             if move[0] not in FOUNDATIONS]
+    return rng.choice(moves) if moves else None
+
+
+class SolverPolicy():
+    """
+    The solver's winning line when it finds one
+    within `max_nodes`, otherwise greedy
+    """
+    def __init__(self, max_nodes: int = SOLVER_NODES):
+        self.max_nodes = max_nodes
+        self.line = []
+
+    def __call__(self, game: Klondike,
+                 rng: Random) -> tuple[int, int, int] | None:
+        if not game.history:  # <- A new deal
+            self.line = solve(game, self.max_nodes,
+                              table_size=self.max_nodes).moves
+        if len(game.history) < len(self.line):
+            return self.line[len(game.history)]
+
+        return greedy(game, rng)
+
+
+# Name -> callable taking (game, rng) and returning a move, or None to stop
+POLICIES = {
+    'greedy': greedy,
+    'random': random_move,
+    'solver': SolverPolicy(),
+}
+
+
+def play_game(game: Klondike, policy, rng: Random):
+    for _ in range(MAX_MOVES):
+        if game.win:
+            break
+
+        move = policy(game, rng)
+        if move is None or not game.move(*move):
+            break
+
+    if game.win:
+        for move in game.autocomplete_moves():
+            game.move(*move)
+
+
+def play_sessions(job: tuple[str, int, int, int]) -> tuple[np.ndarray,
+                                                            np.ndarray]:
+    """
+    Earnings per game and wins, each (sessions,
+    games); games after a ruin earn 0 and don't win
+    """
+    name, first_seed, sessions, games = job
+    policy = POLICIES[name]
+    earnings = np.zeros((sessions, games), dtype=np.int16)
+    wins = np.zeros((sessions, games), dtype=bool)
+
+    for n in range(sessions):
+        rng = Random(first_seed + n)
+        game = Klondike(first_seed + n)
+        for m in range(games):
+            if m:
+                game.next_game()
+            play_game(game, policy, rng)
+            earnings[n, m] = game.game_earnings
+            wins[n, m] = game.win
+            if game.bank + game.game_earnings <= 0:
+                break  # <- Can't buy in again
+
+    return earnings, wins
+
+
+def report(name: str, earnings: np.ndarray, wins: np.ndarray,
+           seconds: float):
+    sessions, games = earnings.shape
+    banks = 100 + np.cumsum(earnings, axis=1, dtype=np.int64)
+    ruined = banks <= 0
+    played = np.ones_like(ruined)
+    played[:, 1:] = ~ruined[:, :-1]  # <- Every game up to and including ruin
+    played_count = int(played.sum())
+    per_game = earnings[played]
+
+    print(f'{name}: {sessions} sessions, {played_count} games, '
+          f'{played_count / seconds:,.0f} games/s')
+    print(f'  EV per game  G{per_game.mean():+.2f} '
+          f'(sd {per_game.std():.1f}), won {wins[played].mean():.2%}')
+    print('  ruined by    ' + '  '.join(
+        f'game {n}: {ruined[:, n - 1].mean():.2%}'
+        for n in CHECKPOINTS if n <= games))
+    print('  final bank   ' + '  '.join(
+        f'p{p}: G{v:.0f}' for p, v in zip(
+            [5, 50, 95], np.percentile(banks[:, -1], [5, 50, 95]))))
+    print('  mean bank    ' + '  '.join(
+        f'game {n}: G{banks[:, n - 1].mean():.0f}'
+        for n in CHECKPOINTS if n <= games))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sessions', type=int, default=1000)
+    parser.add_argument('--games', type=int, default=100,
+                        help='games per session, at most')
+    parser.add_argument('--policies', nargs='+', choices=POLICIES,
+                        default=['greedy', 'random'])
+    parser.add_argument('--seed', type=int, default=0,
+                        help='first session seed; session n deals from n + seed')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--chunk', type=int, default=50,
+                        help='sessions per job')
+    parser.add_argument('-o', '--output', type=str, default=None,
+                        help='save every policy\'s earnings to this .npz file')
+    args = parser.parse_args()
+
+    results = {}
+    with Pool(args.workers) as pool:
+        for name in args.policies:
+            jobs = [(name, args.seed + start,
+                     min(args.chunk, args.sessions - start), args.games)
+                    for start in range(0, args.sessions, args.chunk)]
+            start = perf_counter()
+            parts = pool.map(play_sessions, jobs)
+            earnings = np.concatenate([part[0] for part in parts])
+            wins = np.concatenate([part[1] for part in parts])
+            report(name, earnings, wins, perf_counter() - start)
+            results[f'{name}_earnings'] = earnings
+            results[f'{name}_wins'] = wins
+
+    if args.output:
+        np.savez_compressed(args.output, **results)
+
+
+if __name__ == '__main__':
+    main()
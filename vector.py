@@ -0,0 +1,391 @@
+"""
+Many games of Klondike held as NumPy arrays and
+stepped in lockstep, for simulations too big for
+one Python object per game:
+
+    python vector.py --games 10000 --steps 300
+
+Moves are indices into MOVES, the (source, depth,
+target) triples Klondike.move takes, numbered in
+the order Klondike.legal_moves lists them. Every
+game has the same rules.Rules. There is no undo.
+Replay random games next to Klondike objects and
+stop at the first difference with
+
+    python vector.py --check --games 500
+"""
+import argparse
+import sys
+
+from random import Random
+from time import perf_counter
+
+import numpy as np
+
+from rules import (FOUNDATIONS, GRAVEYARD, LIBRARY, PAYOUTS, TABLEAU,
+                   Klondike, Rules, deal_order, wants_tables)
+
+
+MAX_RUN = 12  # <- Face-up cards a column can hold, King down to 2
+PILES   = 13
+DRAW    = 0  # <- Index of (LIBRARY, 1, GRAVEYARD) in MOVES
+NO_CARD = 52  # <- Pads wanted cards; lies face down under the library
+
+
+def build_moves() -> list[tuple[int, int, int]]:
+    """Every move Klondike.legal_moves can list, in its order"""
+    moves = [(LIBRARY, 1, GRAVEYARD)]
+    for source in [GRAVEYARD, *FOUNDATIONS, *TABLEAU]:
+        for depth in range(1, MAX_RUN + 1 if source in TABLEAU else 2):
+            for target in [*FOUNDATIONS, *TABLEAU]:
+                if target != source and (depth == 1 or target in TABLEAU):
+                    moves.append((source, depth, target))
+
+    return moves
+
+
+MOVES = build_moves()
+MOVE_SOURCE, MOVE_DEPTH, MOVE_TARGET = np.array(MOVES).T
+
+# (source, depth, target) -> index into MOVES, or -1. Depths run to 52
+# so a card's depth in any pile can be looked up without clipping
+MOVE_INDEX = np.full((PILES, 53, PILES), -1, dtype=np.int16)
+MOVE_INDEX[MOVE_SOURCE, MOVE_DEPTH, MOVE_TARGET] = np.arange(len(MOVES))
+
+IS_FOUNDATION = np.isin(np.arange(PILES), FOUNDATIONS)
+IS_TABLEAU    = np.isin(np.arange(PILES), TABLEAU)
+TARGETS       = np.array([*FOUNDATIONS, *TABLEAU])
+
+
+def compile_wants(kings_only: bool) -> tuple[np.ndarray, np.ndarray]:
+    """
+    rules.wants_tables as arrays: the card ids each
+    pile takes by its top card's id + 1 (padded with
+    NO_CARD), and the same as a (pile, top + 1, card)
+    mask
+    """
+    tables = wants_tables(kings_only)
+    width = max(len(wants) for table in tables if table for wants in table)
+    wanted = np.full((PILES, 53, width), NO_CARD, dtype=np.int8)
+    takes = np.zeros((PILES, 53, 52), dtype=bool)
+    for pile, table in enumerate(tables):
+        for top, wants in enumerate(table or []):
+            wanted[pile, top, :len(wants)] = wants
+            takes[pile, top, wants] = True
+
+    return wanted, takes
+
+
+class Games():
+    """
+    N games dealt from `seeds`. For game g, `cards[g,
+    pile]` holds card ids from the bottom up (-1 past
+    the top) and `heights[g, pile]` how many there
+    are; `pile_of[g, card]` and `row_of[g, card]` say
+    where each card is and `face_up[g, card]` which
+    way up it is (with NO_CARD as a 53rd card that
+    never moves, so padding needs no masking).
+    """
+    def __init__(self, seeds, rules: Rules | None = None):
+        self.rules = rules or Rules()
+        self.size = size = len(seeds)
+        self.draw_count = self.rules.draw
+        self.max_recycles = np.iinfo(np.int64).max \
+            if self.rules.passes is None else self.rules.passes - 1
+        self.payouts = np.array(PAYOUTS)
+        wanted, self.takes = compile_wants(self.rules.kings_only)
+        self.wants = []  # <- Foundations and columns, each padded to its
+                         # own width: (targets, wanted by pile * 53 + top + 1)
+        for targets in [FOUNDATIONS, TABLEAU]:
+            targets = np.array(targets, dtype=np.int32)
+            width = (wanted[targets] != NO_CARD).sum(axis=2).max()
+            self.wants.append((targets, wanted[:, :, :width]
+                               .reshape(PILES * 53, width)))
+
+        # Library order for each deal, bottom card first (Klondike.shuffle)
+        orders = np.array([deal_order(seed) for seed in seeds]).reshape(-1, 52)
+        self.cards = np.full((size, PILES, 52), -1, dtype=np.int8)
+        self.heights = np.zeros((size, PILES), dtype=np.int32)
+        dealt = 51
+        for row in range(7):  # <- As Klondike.deal, top of the library first
+            for column in range(row, 7):
+                self.cards[:, TABLEAU[column], row] = orders[:, dealt]
+                dealt -= 1
+        self.cards[:, LIBRARY, :dealt + 1] = orders[:, :dealt + 1]
+        self.heights[:, LIBRARY] = dealt + 1
+        self.heights[:, TABLEAU] = np.arange(1, 8)
+
+        self.pile_of = np.zeros((size, 53), dtype=np.int32)
+        self.row_of = np.zeros((size, 53), dtype=np.int32)
+        games, piles, rows = np.nonzero(self.cards >= 0)
+        cards = self.cards[games, piles, rows]
+        self.pile_of[games, cards] = piles
+        self.row_of[games, cards] = rows
+
+        self.face_up = np.zeros((size, 53), dtype=bool)
+        for column in range(7):
+            self.face_up[np.arange(size),
+                         self.cards[:, TABLEAU[column], column]] = True
+
+        self.face_down_cards = np.full(size, 21)
+        self.foundation_cards = np.zeros(size, dtype=np.int64)
+        self.recycles = np.zeros(size, dtype=np.int64)
+
+        # Flat offsets of each game's rows, for np.take on raveled arrays
+        offsets = np.arange(size, dtype=np.int32)
+        self.card_offsets = offsets[:, None, None] * 53
+        self.pile_offsets = offsets[:, None] * PILES
+
+    @property
+    def earnings(self) -> np.ndarray:
+        return self.payouts[self.foundation_cards]
+
+    @property
+    def win(self) -> np.ndarray:
+        return self.face_down_cards == 0
+
+    def can_draw(self) -> np.ndarray:
+        """Klondike.can_draw for every game"""
+        return (self.heights[:, LIBRARY] > 0) \
+            | ((self.heights[:, GRAVEYARD] > 0)
+               & (self.recycles < self.max_recycles))
+
+    def draw(self, games: np.ndarray):
+        """Turn cards onto the graveyard in `games`, all with a library"""
+        counts = np.minimum(self.heights[games, LIBRARY], self.draw_count)
+        moved = self.transfer(games, np.full(len(games), LIBRARY),
+                              np.full(len(games), GRAVEYARD), counts,
+                              reverse=True)
+        self.face_up[moved] = True
+
+    def legal(self) -> tuple[np.ndarray, np.ndarray]:
+        """Every legal move as (game, move index) pairs, by game"""
+        moves = self.legal_moves()
+        games, slots = np.nonzero(moves >= 0)
+        return games, moves[games, slots].astype(np.int64)
+
+    def legal_mask(self) -> np.ndarray:
+        """(game, move) whether each of MOVES is legal"""
+        mask = np.zeros((self.size, len(MOVES) + 1), dtype=bool)
+        mask[np.arange(self.size)[:, None], self.legal_moves()] = True
+        return mask[:, :-1]  # <- The last column caught the -1 padding
+
+    def legal_moves(self) -> np.ndarray:
+        """
+        (game, slot) the legal moves of each game, -1
+        in unused slots: slot 0 for the draw, then one
+        per card each foundation and column wants
+        """
+        tops = self.tops()
+        draws = np.where(self.can_draw(), DRAW, -1).astype(np.int16)
+        slots = [draws[:, None]]
+        for targets, wanted in self.wants:
+            cards = self.card_offsets + np.take(  # <- (game, target, n), flat
+                wanted, targets * 53 + tops[:, targets] + 1, axis=0)
+            sources = np.take(self.pile_of, cards)
+            depths = np.take(self.heights, self.pile_offsets[:, :, None]
+                             + sources) - np.take(self.row_of, cards)
+            moves = np.take(MOVE_INDEX, (sources * 53 + depths) * PILES
+                            + targets[:, None])  # <- -1 when the depth or
+            slots.append(np.where(np.take(self.face_up, cards),  # piles can't
+                                  moves, np.int16(-1))  # move
+                         .reshape(self.size, -1))
+
+        return np.concatenate(slots, axis=1)
+
+    def pile(self, game: int, index: int) -> list[tuple[int, bool]]:
+        """(card id, face up) from the bottom of one pile"""
+        cards = self.cards[game, index, :self.heights[game, index]]
+        return [(int(card), bool(self.face_up[game, card]))
+                for card in cards]
+
+    def random_moves(self, rng: np.random.Generator) -> np.ndarray:
+        """A uniformly random legal move per game, -1 for none"""
+        moves = self.legal_moves()
+        legal = moves >= 0
+        picks = (rng.random(self.size) * legal.sum(axis=1)).astype(np.int64)
+        slots = (legal.cumsum(axis=1, dtype=np.int16)
+                 > picks[:, None]).argmax(axis=1)
+        return moves[np.arange(self.size), slots].astype(np.int64)
+
+    def recycle(self, games: np.ndarray):
+        """Turn the graveyard back over in `games`"""
+        moved = self.transfer(games, np.full(len(games), GRAVEYARD),
+                              np.full(len(games), LIBRARY),
+                              self.heights[games, GRAVEYARD], reverse=True)
+        self.face_up[moved] = False
+        self.recycles[games] += 1
+
+    def reveal(self, games: np.ndarray, piles: np.ndarray):
+        """Turn up the top cards of `piles` that are face down"""
+        heights = self.heights[games, piles]
+        cards = self.cards[games, piles, heights - 1]
+        hidden = (heights > 0) & ~self.face_up[games, cards]
+        self.face_up[games[hidden], cards[hidden]] = True
+        self.face_down_cards[games[hidden]] -= 1
+
+    def step(self, moves: np.ndarray) -> np.ndarray:
+        """
+        Play MOVES[moves[g]] in each game g (-1 to
+        skip one), as Klondike.move would. Returns
+        which games made a legal move.
+        """
+        played = np.zeros(self.size, dtype=bool)
+        games = np.nonzero(moves >= 0)[0]
+        moves = moves[games]
+        sources = MOVE_SOURCE[moves]
+        depths = MOVE_DEPTH[moves]
+        targets = MOVE_TARGET[moves]
+
+        rows = self.heights[games, sources] - depths
+        cards = self.cards[games, sources, np.maximum(rows, 0)]
+        tops = self.cards[games, targets, self.heights[games, targets] - 1]
+        legal = np.where(moves == DRAW, self.can_draw()[games],
+                         (rows >= 0) & self.face_up[games, cards]
+                         & self.takes[targets, tops + 1, cards])
+        played[games[legal]] = True
+
+        draw = legal & (moves == DRAW)
+        drawing = draw & (self.heights[games, LIBRARY] > 0)
+        self.draw(games[drawing])
+        self.recycle(games[draw & ~drawing])
+
+        move = legal & (moves != DRAW)
+        games, sources, depths, targets = \
+            games[move], sources[move], depths[move], targets[move]
+        self.transfer(games, sources, targets, depths)
+        self.foundation_cards[games] += depths * IS_FOUNDATION[targets] \
+            - depths * IS_FOUNDATION[sources]
+        self.reveal(games[IS_TABLEAU[sources]],
+                    sources[IS_TABLEAU[sources]])
+
+        return played
+
+    def tops(self) -> np.ndarray:
+        """(game, pile) top card ids, -1 for empty piles"""
+        rows = (self.pile_offsets + np.arange(PILES)) * 52 + self.heights - 1
+        return np.take(self.cards, rows)  # <- An empty pile reads the
+                                          # unused last row before it
+    def transfer(self, games: np.ndarray, sources: np.ndarray,
+                 targets: np.ndarray, counts: np.ndarray,
+                 reverse: bool = False) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Move the top `counts` cards of each source to
+        its target (one per game), keeping their order
+        or, with `reverse`, dealing them one at a time.
+        Returns the (game, card) pairs moved.
+        """
+        index, offsets = np.nonzero(np.arange(counts.max(initial=0))
+                                    < counts[:, None])
+        each_game = games[index]
+        source_heights = self.heights[each_game, sources[index]]
+        if reverse:
+            from_rows = source_heights - 1 - offsets
+        else:
+            from_rows = source_heights - counts[index] + offsets
+        to_rows = self.heights[each_game, targets[index]] + offsets
+
+        cards = self.cards[each_game, sources[index], from_rows]
+        self.cards[each_game, sources[index], from_rows] = -1
+        self.cards[each_game, targets[index], to_rows] = cards
+        self.pile_of[each_game, cards] = targets[index]
+        self.row_of[each_game, cards] = to_rows
+
+        self.heights[games, sources] -= counts
+        self.heights[games, targets] += counts
+        return each_game, cards
+
+
+def check(games: int, steps: int, rules: Rules, seed: int) -> bool:
+    """
+    Play random moves in `games` deals as Games and
+    as Klondike objects, comparing piles, legal moves,
+    earnings and wins after every step
+    """
+    batch = Games(range(seed, seed + games), rules)
+    klondikes = [Klondike(n, rules=rules) for n in range(seed, seed + games)]
+    rng = Random(seed)
+
+    for step in range(steps + 1):
+        mask = batch.legal_mask()
+        moves = np.full(games, -1)
+        for n, game in enumerate(klondikes):
+            expected = game.legal_moves()
+            actual = [MOVES[i] for i in np.nonzero(mask[n])[0]]
+            piles = [[(card.id, card.is_face_up) for card in pile]
+                     for pile in game.piles]
+            if actual != expected or piles != [batch.pile(n, index)
+                                               for index in range(PILES)] \
+                    or batch.earnings[n] != game.game_earnings \
+                    or batch.win[n] != game.win:
+                print(f'Deal {seed + n} differs after {step} moves')
+                return False
+
+            if expected and step < steps:
+                move = rng.choice(expected)
+                if rng.random() < 0.05:  # <- Sometimes an illegal one
+                    move = rng.choice(MOVES)
+                moves[n] = MOVES.index(move)
+
+        played = batch.step(moves)
+        for n, game in enumerate(klondikes):
+            if moves[n] >= 0 and game.move(*MOVES[moves[n]]) != played[n]:
+                print(f'Deal {seed + n} disagrees on whether '
+                      f'{MOVES[moves[n]]} is legal')
+                return False
+
+    print(f'{games} deals agree for {steps} moves with {rules}')
+    return True
+
+
+def benchmark(games: int, steps: int, rules: Rules, seed: int):
+    """Random play: lockstep arrays against one Klondike per game"""
+    batch = Games(range(seed, seed + games), rules)
+    rng = np.random.default_rng(seed)
+    start = perf_counter()
+    for _ in range(steps):
+        batch.step(batch.random_moves(rng))
+    vector_rate = games * steps / (perf_counter() - start)
+
+    klondikes = [Klondike(n, rules=rules) for n in range(seed, seed + games)]
+    python_rng = Random(seed)
+    python_steps = max(1, steps // 10)  # <- Enough for a rate
+    start = perf_counter()
+    for _ in range(python_steps):
+        for game in klondikes:
+            moves = game.legal_moves()
+            if moves:
+                game.move(*python_rng.choice(moves))
+    python_rate = games * python_steps / (perf_counter() - start)
+
+    print(f'{games} games x {steps} moves: {vector_rate:,.0f} moves/s '
+          f'in lockstep, {python_rate:,.0f} moves/s as Klondike objects '
+          f'({vector_rate / python_rate:.0f}x)')
+    print(f'won {batch.win.mean():.2%}, '
+          f'mean earnings G{batch.earnings.mean():+.2f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--games', type=int, default=10_000)
+    parser.add_argument('--steps', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0,
+                        help='first deal number')
+    parser.add_argument('--check', action='store_true',
+                        help='compare every move with Klondike instead')
+    parser.add_argument('--draw', type=int, default=1)
+    parser.add_argument('--passes', type=int, default=1,
+                        help='times through the library, 0 for no limit')
+    parser.add_argument('--any-card-on-empty', action='store_true')
+    args = parser.parse_args()
+
+    rules = Rules(args.draw, args.passes or None,
+                  kings_only=not args.any_card_on_empty)
+    if args.check:
+        sys.exit(not check(args.games, args.steps, rules, args.seed))
+
+    benchmark(args.games, args.steps, rules, args.seed)
+
+
+if __name__ == '__main__':
+    main()